@@ -1,8 +1,9 @@
 """BIDS-related interfaces for sMRIPost-LINC."""
 
+from functools import lru_cache
 from json import loads
+from typing import ClassVar
 
-from bids.layout import Config
 from nipype.interfaces.base import (
     DynamicTraitedSpec,
     SimpleInterface,
@@ -15,17 +16,43 @@ from niworkflows.interfaces.bids import DerivativesDataSink as BaseDerivativesDa
 from smripost_linc.data import load as load_data
 from smripost_linc.utils.bids import _get_bidsuris
 
-# NOTE: Modified for smripost_linc's purposes
-smripost_linc_spec = loads(load_data('io_spec.json').read_text())
-bids_config = Config.load('bids')
-deriv_config = Config.load('derivatives')
 
-smripost_linc_entities = {v['name']: v['pattern'] for v in smripost_linc_spec['entities']}
-merged_entities = {**bids_config.entities, **deriv_config.entities}
-merged_entities = {k: v.pattern for k, v in merged_entities.items()}
-merged_entities = {**merged_entities, **smripost_linc_entities}
-merged_entities = [{'name': k, 'pattern': v} for k, v in merged_entities.items()]
-config_entities = frozenset({e['name'] for e in merged_entities})
+@lru_cache(maxsize=1)
+def _load_spec():
+    """Load sMRIPost-LINC's BIDS specification (io_spec.json)."""
+    return loads(load_data('io_spec.json').read_text())
+
+
+@lru_cache(maxsize=1)
+def _get_merged_entities():
+    """Merge the PyBIDS entities with sMRIPost-LINC's custom entities.
+
+    Returns
+    -------
+    config_entities : frozenset
+        Names of all entities.
+    merged_entities : tuple of dict
+        Name/pattern pairs for all entities.
+    file_patterns : tuple of str
+        Default path patterns for derivatives.
+    """
+    from bids.layout import Config
+
+    # NOTE: Modified for smripost_linc's purposes
+    smripost_linc_spec = _load_spec()
+    bids_config = Config.load('bids')
+    deriv_config = Config.load('derivatives')
+
+    # Later sources override earlier ones
+    entity_patterns = {}
+    for entities in (bids_config.entities, deriv_config.entities):
+        entity_patterns.update({k: v.pattern for k, v in entities.items()})
+
+    entity_patterns.update({v['name']: v['pattern'] for v in smripost_linc_spec['entities']})
+    merged_entities = tuple({'name': k, 'pattern': v} for k, v in entity_patterns.items())
+    config_entities = frozenset(entity_patterns)
+    file_patterns = tuple(smripost_linc_spec['default_path_patterns'])
+    return config_entities, merged_entities, file_patterns
 
 
 class DerivativesDataSink(BaseDerivativesDataSink):
@@ -33,13 +60,35 @@ class DerivativesDataSink(BaseDerivativesDataSink):
 
     A child class of the niworkflows DerivativesDataSink,
     using smripost_linc's configuration files.
+    The configuration is loaded on first instantiation rather than at import time,
+    and again when an instance is unpickled or run, since workflows are often built
+    in a different process than the one that runs them.
     """
 
     out_path_base = ''
-    _allowed_entities = set(config_entities)
-    _config_entities = config_entities
-    _config_entities_dict = merged_entities
-    _file_patterns = smripost_linc_spec['default_path_patterns']
+    _config_entities: ClassVar[frozenset]
+    _config_entities_dict: ClassVar[tuple]
+    _file_patterns: ClassVar[tuple]
+
+    def __init__(self, **inputs):
+        self._load_config()
+        super().__init__(**inputs)
+
+    def __setstate__(self, state):
+        self._load_config()
+        self.__dict__.update(state)
+
+    def _run_interface(self, runtime):
+        self._load_config()
+        return super()._run_interface(runtime)
+
+    @classmethod
+    def _load_config(cls):
+        """Populate the entity configuration class attributes."""
+        config_entities, merged_entities, file_patterns = _get_merged_entities()
+        cls._config_entities = config_entities
+        cls._config_entities_dict = merged_entities
+        cls._file_patterns = file_patterns
 
 
 class _BIDSURIInputSpec(DynamicTraitedSpec):
@@ -75,21 +124,18 @@ class BIDSURI(SimpleInterface):
     def __init__(self, numinputs=0, **inputs):
         super().__init__(**inputs)
         self._numinputs = numinputs
-        if numinputs >= 1:
-            input_names = [f'in{i + 1}' for i in range(numinputs)]
-        else:
-            input_names = []
-        add_traits(self.inputs, input_names)
+        self._input_names = tuple(f'in{i + 1}' for i in range(numinputs))
+        add_traits(self.inputs, list(self._input_names))
 
     def _run_interface(self, runtime):
-        inputs = [getattr(self.inputs, f'in{i + 1}') for i in range(self._numinputs)]
+        inputs = [getattr(self.inputs, name) for name in self._input_names]
         uris = _get_bidsuris(inputs, self.inputs.dataset_links, self.inputs.out_dir)
         self._results['out'] = uris
 
         # Add the URIs to the metadata dictionary.
-        metadata = self.inputs.metadata or {}
-        metadata = metadata.copy()
-        metadata[self.inputs.field] = metadata.get(self.inputs.field, []) + uris
-        self._results['metadata'] = metadata
+        in_metadata = self.inputs.metadata or {}
+        field_uris = list(in_metadata.get(self.inputs.field, ()))
+        field_uris.extend(uris)
+        self._results['metadata'] = {**in_metadata, self.inputs.field: field_uris}
 
         return runtime
@@ -1,8 +1,8 @@
 """Interfaces for working with FreeSurfer."""
 
+import filecmp
 import os
 import shutil
-from glob import glob
 
 from nipype.interfaces.base import (
     Directory,
@@ -50,24 +50,30 @@ class FreesurferFiles(SimpleInterface):
     output_spec = _FreesurferFilesOutputSpec
 
     def _run_interface(self, runtime):
-        in_dir = self.inputs.freesurfer_dir
-        gwr = os.path.join(in_dir, 'surf', f'{self.inputs.hemi}.w-g.pct.mgh')
-        lgi = os.path.join(in_dir, 'surf', f'{self.inputs.hemi}.pial_lgi')
+        surf_dir = os.path.join(self.inputs.freesurfer_dir, 'surf')
+        hemi = self.inputs.hemi
+        candidates = [
+            (f'{hemi}.w-g.pct.mgh', 'gwr', '--snr'),
+            (f'{hemi}.pial_lgi', 'lgi', ''),
+        ]
+
+        # Read the directory once instead of probing each file separately.
+        # DirEntry.is_file uses the file type cached by scandir where available.
+        with os.scandir(surf_dir) as it:
+            present = {entry.name for entry in it if entry.is_file()}
+
         files = []
         names = []
         arguments = []
-        if os.path.exists(gwr):
-            files.append(gwr)
-            names.append('gwr')
-            arguments.append('--snr')
-
-        if os.path.exists(lgi):
-            files.append(lgi)
-            names.append('lgi')
-            arguments.append('')
+        for fname, name, argument in candidates:
+            if fname in present:
+                files.append(os.path.join(surf_dir, fname))
+                names.append(name)
+                arguments.append(argument)
 
         self._results['files'] = files
         self._results['names'] = names
+        self._results['arguments'] = arguments
 
         return runtime
 
@@ -118,7 +124,7 @@ class CopyAnnots(SimpleInterface):
         )
         self._results['out_file'] = out_file
 
-        shutil.copyfile(self.inputs.in_file, out_file)
+        _link_or_copy(self.inputs.in_file, out_file)
 
         return runtime
 
@@ -155,14 +161,42 @@ class CollectFSAverageSurfaces(SimpleInterface):
             self.inputs.freesurfer_dir,
             'surf',
         )
-        lh_mgh_files = sorted(glob(os.path.join(in_dir, 'lh.*.fsaverage.mgh')))
-        self._results['lh_fsaverage_files'] = lh_mgh_files
-        self._results['names'] = []
-        self._results['rh_fsaverage_files'] = []
-        for lh_file in lh_mgh_files:
-            name = os.path.basename(lh_file).split('.')[1]
-            self._results['names'].append(name)
-            rh_file = os.path.join(in_dir, f'rh.{name}.fsaverage.mgh')
-            self._results['rh_fsaverage_files'].append(rh_file)
+        suffix = '.fsaverage.mgh'
+
+        # Partition the fsaverage-space surfaces by hemisphere in a single pass
+        hemi_files = {'lh': {}, 'rh': {}}
+        with os.scandir(in_dir) as it:
+            for entry in it:
+                hemi, _, rest = entry.name.partition('.')
+                if hemi in hemi_files and rest.endswith(suffix):
+                    hemi_files[hemi][rest[: -len(suffix)]] = entry.path
+
+        # Only keep surfaces that are available for both hemispheres
+        names = sorted(hemi_files['lh'].keys() & hemi_files['rh'].keys())
+        self._results['names'] = names
+        self._results['lh_fsaverage_files'] = [hemi_files['lh'][name] for name in names]
+        self._results['rh_fsaverage_files'] = [hemi_files['rh'][name] for name in names]
 
         return runtime
+
+
+def _link_or_copy(src, dst):
+    """Hardlink ``src`` to ``dst``, falling back to a copy.
+
+    Hardlinks fail across filesystems (or where links are not permitted),
+    in which case the file contents are copied instead.
+    Nothing is done if ``dst`` already matches ``src``
+    (e.g., when a workflow is resumed).
+    Any other existing ``dst`` is unlinked first, so that files sharing its inode
+    (or the target of a symlink) are not overwritten.
+    """
+    if os.path.lexists(dst):
+        # filecmp compares the stat signatures (size, mtime) before the contents
+        if os.path.exists(dst) and filecmp.cmp(src, dst, shallow=True):
+            return
+        os.remove(dst)
+
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
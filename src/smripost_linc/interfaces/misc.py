@@ -1,8 +1,9 @@
 """Miscellaneous interfaces for sMRIPost-LINC."""
 
+import io
+import mmap
 import os
 
-import numpy as np
 from nipype.interfaces.base import (
     CommandLineInputSpec,
     DynamicTraitedSpec,
@@ -89,10 +90,15 @@ class WBCommand(WBCommandBase):
 
         if hasattr(self.inputs, 'num_threads'):
             self.inputs.on_trait_change(self._nthreads_update, 'num_threads')
+            # Apply the default as well, so wb_command doesn't use every available core
+            self._nthreads_update()
 
     def _nthreads_update(self):
         """Update environment with new number of threads."""
-        self.inputs.environ['OMP_NUM_THREADS'] = str(self.inputs.num_threads)
+        nthreads = str(self.inputs.num_threads)
+        # Only touch the environ trait when the value actually changes
+        if self.inputs.environ.get('OMP_NUM_THREADS') != nthreads:
+            self.inputs.environ['OMP_NUM_THREADS'] = nthreads
 
 
 class _CiftiSeparateMetricInputSpec(_WBCommandInputSpec):
@@ -237,12 +243,15 @@ class CiftiCreateDenseScalar(WBCommand):
         if name != 'out_file':
             return None
 
-        if isdefined(self.inputs.out_file):
-            return self.inputs.out_file
-        elif isdefined(self.inputs.volume_data):
-            _, fname, _ = split_filename(self.inputs.volume_data)
+        # Read each relevant input only once
+        inputs = self.inputs
+        out_file, volume_data = inputs.out_file, inputs.volume_data
+        if isdefined(out_file):
+            return out_file
+        elif isdefined(volume_data):
+            _, fname, _ = split_filename(volume_data)
         else:
-            _, fname, _ = split_filename(self.inputs.left_metric)
+            _, fname, _ = split_filename(inputs.left_metric)
 
         return f'{fname}_converted.dscalar.nii'
 
@@ -274,18 +283,8 @@ class ParcellationStats2TSV(SimpleInterface):
     input_spec = _ParcellationStats2TSVInputSpec
     output_spec = _ParcellationStats2TSVOutputSpec
 
-    def _sanity_check_columns(df, ref_col, red_col, atol=0):
-        if not np.allclose(
-            df[ref_col].astype(np.float32),
-            df[red_col].astype(np.float32),
-            atol=atol,
-        ):
-            raise Exception(f'The {ref_col} values were not identical to {red_col}')
-
-        df.drop(red_col, axis=1, inplace=True)
-        return df
-
     def _run_interface(self, runtime):
+        import numpy as np
         import pandas as pd
 
         redundant_columns = [
@@ -295,31 +294,70 @@ class ParcellationStats2TSV(SimpleInterface):
             ('SurfArea', 'Area_mm2_piallgi', 1),
         ]
 
-        with open(self.inputs.in_file) as f_obj:
-            data = f_obj.readlines()
-
-        idx = [i for i, line in enumerate(data) if line.startswith('# ColHeaders ')]
-        if len(idx) != 1:
+        # Locate the header line with a C-level search over the memory-mapped file,
+        # then let pandas' C parser read the table that follows it
+        header = b'# ColHeaders '
+        columns, table = None, None
+        with open(self.inputs.in_file, 'rb') as f_obj:
+            if os.fstat(f_obj.fileno()).st_size:
+                with mmap.mmap(f_obj.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if mm[: len(header)] == header:
+                        header_start = 0
+                    else:
+                        header_start = mm.find(b'\n' + header) + 1
+
+                    if mm[header_start : header_start + len(header)] == header:
+                        header_end = mm.find(b'\n', header_start)
+                        if header_end == -1:
+                            header_end = len(mm)
+
+                        # The file must have exactly one header line
+                        if mm.find(b'\n' + header, header_end) == -1:
+                            columns = mm[header_start + len(header) : header_end].decode().split()
+                            table = io.BytesIO(mm[header_end + 1 :])
+
+        if columns is None:
             raise ValueError(f'Could not find column headers in the file {self.inputs.in_file}')
 
-        idx = idx[0]
-
-        columns_row = data[idx]
-        actual_data = data[idx + 1 :]
-        actual_data = [line.split() for line in actual_data]
-        columns = columns_row.replace('# ColHeaders ', '').split()
-
-        df = pd.DataFrame(
-            columns=columns,
-            data=actual_data,
+        df = pd.read_csv(
+            table,
+            sep=r'\s+',
+            header=None,
+            names=columns,
+            dtype=str,
+            engine='c',
         )
-        df.insert(0, 'hemisphere', self.inputs.hemisphere)
-        df.insert(0, 'atlas', self.inputs.atlas)
-
-        for ref_col, red_col, atol in redundant_columns:
-            if ref_col in df.columns and red_col in df.columns:
-                df = self._sanity_check_columns(df=df, ref_col=ref_col, red_col=red_col, atol=atol)
+        df = df.assign(atlas=self.inputs.atlas, hemisphere=self.inputs.hemisphere)
+        df = df[['atlas', 'hemisphere', *columns]]
 
-        df.to_csv(self._results['out_file'], sep='\t', index=False)
+        # Check all redundant column pairs at once, then drop the redundant columns
+        redundant_columns = [
+            (ref_col, red_col, atol)
+            for ref_col, red_col, atol in redundant_columns
+            if ref_col in df.columns and red_col in df.columns
+        ]
+        if redundant_columns:
+            ref_cols, red_cols, atols = (list(v) for v in zip(*redundant_columns))
+            matches = np.isclose(
+                df[ref_cols].to_numpy(dtype=np.float64),
+                df[red_cols].to_numpy(dtype=np.float64),
+                atol=np.array(atols, dtype=np.float64),
+                equal_nan=True,
+            ).all(axis=0)
+            if not matches.all():
+                i_col = np.flatnonzero(~matches)[0]
+                raise ValueError(
+                    f'The {ref_cols[i_col]} values were not identical to {red_cols[i_col]}'
+                )
+
+            df = df.drop(columns=red_cols)
+
+        out_file = self.inputs.out_file
+        if not isdefined(out_file):
+            _, fname, _ = split_filename(self.inputs.in_file)
+            out_file = os.path.join(runtime.cwd, f'parcellated_{fname}.tsv')
+
+        self._results['out_file'] = out_file
+        df.to_csv(out_file, sep='\t', index=False, lineterminator='\n')
 
         return runtime
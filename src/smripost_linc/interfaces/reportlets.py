@@ -64,6 +64,16 @@ FUNCTIONAL_TEMPLATE = """\
 \t\t</details>
 """
 
+BIDS_NAME = re.compile(
+    r'^(.*\/)?'
+    '(?P<subject_id>sub-[a-zA-Z0-9]+)'
+    '(_(?P<session_id>ses-[a-zA-Z0-9]+))?'
+    '(_(?P<task_id>task-[a-zA-Z0-9]+))?'
+    '(_(?P<acq_id>acq-[a-zA-Z0-9]+))?'
+    '(_(?P<rec_id>rec-[a-zA-Z0-9]+))?'
+    '(_(?P<run_id>run-[a-zA-Z0-9]+))?'
+)
+
 ABOUT_TEMPLATE = """\t<ul>
 \t\t<li>sMRIPost-LINC version: {version}</li>
 \t\t<li>sMRIPost-LINC command: <code>{command}</code></li>
@@ -107,16 +117,6 @@ class SubjectSummary(SummaryInterface):
     output_spec = SummaryOutputSpec
 
     def _generate_segment(self):
-        BIDS_NAME = re.compile(
-            r'^(.*\/)?'
-            '(?P<subject_id>sub-[a-zA-Z0-9]+)'
-            '(_(?P<session_id>ses-[a-zA-Z0-9]+))?'
-            '(_(?P<task_id>task-[a-zA-Z0-9]+))?'
-            '(_(?P<acq_id>acq-[a-zA-Z0-9]+))?'
-            '(_(?P<rec_id>rec-[a-zA-Z0-9]+))?'
-            '(_(?P<run_id>run-[a-zA-Z0-9]+))?'
-        )
-
         # Add list of tasks with number of runs
         bold_series = self.inputs.bold if isdefined(self.inputs.bold) else []
         bold_series = [s[0] if isinstance(s, list) else s for s in bold_series]
@@ -214,7 +214,7 @@ class ICAAROMARPT(SimpleInterface):
     def _run_interface(self, runtime):
         from niworkflows.viz.utils import plot_melodic_components
 
-        out_file = os.path.abspath(self.inputs.out_report)
+        out_file = os.path.join(runtime.cwd, self.inputs.out_report)
 
         plot_melodic_components(
             melodic_dir=self.inputs.melodic_dir,
@@ -255,22 +255,67 @@ class ICAAROMAMetricsRPT(SimpleInterface):
     output_spec = _ICAAROMAMetricsOutputSpecRPT
 
     def _run_interface(self, runtime):
+        import numpy as np
         import pandas as pd
-        import seaborn as sns
+        from matplotlib import rc_context
+        from matplotlib.figure import Figure
+        from matplotlib.patches import Patch
 
-        out_file = os.path.abspath(self.inputs.out_report)
+        out_file = os.path.join(runtime.cwd, self.inputs.out_report)
 
         df = pd.read_table(self.inputs.aroma_features)
 
-        sns.set_theme(style='ticks')
-
-        g = sns.pairplot(
-            df,
-            hue='classification',
-            vars=['edge_fract', 'csf_fract', 'max_RP_corr', 'HFC'],
-            palette={'rejected': 'red', 'accepted': 'blue'},
-            corner=True,
+        metrics = ['edge_fract', 'csf_fract', 'max_RP_corr', 'HFC']
+        palette = {'rejected': ('red', 'Reds'), 'accepted': ('blue', 'Blues')}
+        n_metrics = len(metrics)
+
+        # Lower-triangular grid, with histograms on the diagonal and hexbin densities below it
+        fig = Figure(figsize=(2.5 * n_metrics, 2.5 * n_metrics))
+        axes = fig.subplots(n_metrics, n_metrics, squeeze=False)
+        for i_row, y_metric in enumerate(metrics):
+            for i_col, x_metric in enumerate(metrics):
+                ax = axes[i_row, i_col]
+                if i_col > i_row:
+                    ax.set_visible(False)
+                    continue
+
+                x_range = (df[x_metric].min(), df[x_metric].max())
+                y_range = (df[y_metric].min(), df[y_metric].max())
+                for classification, (color, cmap) in palette.items():
+                    class_df = df.loc[df['classification'] == classification]
+                    if class_df.empty:
+                        continue
+
+                    if i_row == i_col:
+                        counts, edges = np.histogram(class_df[x_metric], bins=20, range=x_range)
+                        ax.stairs(counts, edges, fill=True, color=color, alpha=0.5)
+                    else:
+                        ax.hexbin(
+                            class_df[x_metric],
+                            class_df[y_metric],
+                            gridsize=20,
+                            extent=(*x_range, *y_range),
+                            mincnt=1,
+                            vmin=0,
+                            cmap=cmap,
+                            alpha=0.6,
+                        )
+
+                if i_row == n_metrics - 1:
+                    ax.set_xlabel(x_metric)
+                if i_col == 0 and i_row > 0:
+                    ax.set_ylabel(y_metric)
+
+        fig.legend(
+            handles=[
+                Patch(color=color, alpha=0.5, label=classification)
+                for classification, (color, _) in palette.items()
+            ],
+            loc='upper right',
         )
-        g.savefig(out_file)
+        fig.tight_layout()
+        # Keep text as text and make element IDs deterministic for smaller, reproducible SVGs
+        with rc_context({'svg.fonttype': 'none', 'svg.hashsalt': 'smripost_linc'}):
+            fig.savefig(out_file)
         self._results['out_report'] = out_file
         return runtime
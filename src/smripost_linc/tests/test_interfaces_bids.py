@@ -0,0 +1,60 @@
+"""Tests for smripost_linc.interfaces.bids."""
+
+import os
+import pickle
+
+import nibabel as nb
+import numpy as np
+
+from smripost_linc.interfaces.bids import DerivativesDataSink
+from smripost_linc.tests.utils import chdir, run_pickled_interface
+
+EXPECTED_NAME = 'sub-01_space-fsnative_seg-4S156Parcels_stat-gwr_desc-preproc_morph.tsv'
+
+
+def make_morph_datasink(tmp_path):
+    """Create a DerivativesDataSink for a parcellated morphometry TSV."""
+    source_file = tmp_path / 'sub-01_desc-preproc_T1w.nii.gz'
+    nb.Nifti1Image(np.zeros((2, 2, 2)), np.eye(4)).to_filename(source_file)
+    in_file = tmp_path / 'parcellated.tsv'
+    in_file.write_text('a\n1\n')
+
+    return DerivativesDataSink(
+        base_directory=str(tmp_path / 'out'),
+        source_file=str(source_file),
+        in_file=str(in_file),
+        space='fsnative',
+        segmentation='4S156Parcels',
+        statistic='gwr',
+        suffix='morph',
+        extension='.tsv',
+    )
+
+
+def test_derivatives_datasink_pickle_roundtrip(tmp_path):
+    """Check that an unpickled sink uses sMRIPost-LINC's entities and path patterns."""
+    sink = make_morph_datasink(tmp_path)
+    pickled_file = tmp_path / 'sink.pkl'
+    with open(pickled_file, 'wb') as fobj:
+        pickle.dump(sink, fobj)
+
+    assert run_pickled_interface(pickled_file, tmp_path) == EXPECTED_NAME
+
+    # The process that built the sink produces the same name
+    with chdir(tmp_path):
+        assert os.path.basename(sink.run().outputs.out_file) == EXPECTED_NAME
+
+
+def test_derivatives_datasink_pickled_workflow(tmp_path):
+    """Check a sink's output name after its workflow is pickled, as when the CLI builds it."""
+    from nipype.pipeline import engine as pe
+
+    from smripost_linc.workflows.base import clean_datasinks
+
+    workflow = pe.Workflow(name='single_run_wf')
+    workflow.add_nodes([pe.Node(make_morph_datasink(tmp_path), name='ds_segstats_tsv')])
+    pickled_file = tmp_path / 'workflow.pkl'
+    with open(pickled_file, 'wb') as fobj:
+        pickle.dump(clean_datasinks(workflow), fobj)
+
+    assert run_pickled_interface(pickled_file, tmp_path, 'ds_segstats_tsv') == EXPECTED_NAME
@@ -0,0 +1,151 @@
+"""Tests for smripost_linc.interfaces.misc."""
+
+import os
+
+import pandas as pd
+import pytest
+
+from smripost_linc.interfaces.misc import ParcellationStats2TSV
+from smripost_linc.tests.utils import chdir
+
+STATS_HEADER = """\
+# Table of FreeSurfer cortical parcellation anatomical statistics
+#
+# CreationTime 2024/01/01-00:00:00-GMT
+# hemi lh
+# NTableCols 5
+# TableCol  1 ColHeader StructName
+"""
+STATS_COLUMNS = ['StructName', 'NumVert', 'SurfArea', 'GrayVol', 'ThickAvg']
+STATS_ROWS = [
+    ['LH_Vis_1', '2231', '1520', '4210', '2.100'],
+    ['LH_Vis_2', '1875', '1306', '3650', '2.451'],
+    ['LH_SomMot_1', '3120', '2284', '7018', '2.7330'],
+]
+
+
+def write_stats(path, columns=STATS_COLUMNS, rows=STATS_ROWS, header=STATS_HEADER):
+    """Write a FreeSurfer-style stats table."""
+    lines = [f'# ColHeaders {" ".join(columns)}'] + ['  '.join(row) for row in rows]
+    path.write_text(header + '\n'.join(lines) + '\n')
+    return path
+
+
+def test_parcellation_stats2tsv(tmp_path):
+    """Check that the stats table is converted to a TSV with the values unchanged."""
+    in_file = write_stats(tmp_path / 'lh.4S156Parcels.stats')
+
+    with chdir(tmp_path):
+        results = ParcellationStats2TSV(
+            in_file=str(in_file),
+            atlas='4S156Parcels',
+            hemisphere='lh',
+        ).run()
+
+    out_file = results.outputs.out_file
+    assert out_file == os.path.join(tmp_path, 'parcellated_lh.4S156Parcels.tsv')
+
+    df = pd.read_table(out_file, dtype=str)
+    assert df.columns.tolist() == ['atlas', 'hemisphere', *STATS_COLUMNS]
+    assert (df['atlas'] == '4S156Parcels').all()
+    assert (df['hemisphere'] == 'lh').all()
+    assert df[STATS_COLUMNS].to_numpy().tolist() == STATS_ROWS
+
+
+def test_parcellation_stats2tsv_out_file(tmp_path):
+    """Check that a requested output file is used."""
+    in_file = write_stats(tmp_path / 'lh.4S156Parcels.stats')
+    out_file = tmp_path / 'stats.tsv'
+
+    results = ParcellationStats2TSV(
+        in_file=str(in_file),
+        atlas='4S156Parcels',
+        hemisphere='rh',
+        out_file=str(out_file),
+    ).run(cwd=str(tmp_path))
+
+    assert results.outputs.out_file == str(out_file)
+    df = pd.read_table(out_file, dtype=str)
+    assert (df['hemisphere'] == 'rh').all()
+    assert len(df) == len(STATS_ROWS)
+
+
+def test_parcellation_stats2tsv_redundant_columns(tmp_path):
+    """Check that redundant columns are dropped when they match their reference columns."""
+    columns = ['StructName', 'NumVert', 'SurfArea', 'NVertices_wgpct', 'Area_mm2_wgpct']
+    rows = [
+        ['LH_Vis_1', '2231', '1520', '2231', '1520.6'],
+        ['LH_Vis_2', '1875', '1306', '1875', '1305.2'],
+    ]
+    in_file = write_stats(tmp_path / 'lh.wgpct.stats', columns=columns, rows=rows)
+
+    results = ParcellationStats2TSV(in_file=str(in_file), atlas='4S156Parcels').run(
+        cwd=str(tmp_path)
+    )
+
+    df = pd.read_table(results.outputs.out_file, dtype=str)
+    assert df.columns.tolist() == ['atlas', 'hemisphere', 'StructName', 'NumVert', 'SurfArea']
+    assert df['SurfArea'].tolist() == ['1520', '1306']
+
+
+@pytest.mark.parametrize(
+    ('row', 'message'),
+    [
+        (['LH_Vis_1', '2231', '1520', '2230', '1520'], 'NumVert values were not identical'),
+        (['LH_Vis_1', '2231', '1520', '2231', '1522'], 'SurfArea values were not identical'),
+    ],
+)
+def test_parcellation_stats2tsv_mismatched_columns(tmp_path, row, message):
+    """Check that redundant columns that differ from their reference columns are reported."""
+    columns = ['StructName', 'NumVert', 'SurfArea', 'NVertices_wgpct', 'Area_mm2_wgpct']
+    rows = [['LH_Vis_2', '1875', '1306', '1875', '1306'], row]
+    in_file = write_stats(tmp_path / 'lh.wgpct.stats', columns=columns, rows=rows)
+
+    with pytest.raises(ValueError, match=message):
+        ParcellationStats2TSV(in_file=str(in_file), atlas='4S156Parcels').run(cwd=str(tmp_path))
+
+
+@pytest.mark.parametrize('header', ['', STATS_HEADER + '# ColHeader comments end here\n'])
+def test_parcellation_stats2tsv_header_position(tmp_path, header):
+    """Check that the column headers are found on the first line or after other comments."""
+    in_file = write_stats(tmp_path / 'lh.4S156Parcels.stats', header=header)
+
+    results = ParcellationStats2TSV(in_file=str(in_file), atlas='4S156Parcels').run(
+        cwd=str(tmp_path)
+    )
+
+    df = pd.read_table(results.outputs.out_file, dtype=str)
+    assert df[STATS_COLUMNS].to_numpy().tolist() == STATS_ROWS
+
+
+def test_parcellation_stats2tsv_header_only(tmp_path):
+    """Check that a table without rows, or a final newline, gives an empty TSV."""
+    in_file = tmp_path / 'lh.empty.stats'
+    in_file.write_text(STATS_HEADER + f'# ColHeaders {" ".join(STATS_COLUMNS)}')
+
+    results = ParcellationStats2TSV(in_file=str(in_file), atlas='4S156Parcels').run(
+        cwd=str(tmp_path)
+    )
+
+    df = pd.read_table(results.outputs.out_file, dtype=str)
+    assert df.columns.tolist() == ['atlas', 'hemisphere', *STATS_COLUMNS]
+    assert df.empty
+
+
+@pytest.mark.parametrize(
+    'text',
+    [
+        '',
+        STATS_HEADER,
+        '#  ColHeaders StructName\nLH_Vis_1\n',
+        '# ColHeaders StructName\nLH_Vis_1\n# ColHeaders StructName\nLH_Vis_2\n',
+        '# ColHeaders StructName\n# ColHeaders StructName NumVert\n',
+    ],
+)
+def test_parcellation_stats2tsv_missing_header(tmp_path, text):
+    """Check that files without exactly one column header line are rejected."""
+    in_file = tmp_path / 'lh.missing.stats'
+    in_file.write_text(text)
+
+    with pytest.raises(ValueError, match='Could not find column headers'):
+        ParcellationStats2TSV(in_file=str(in_file), atlas='4S156Parcels').run(cwd=str(tmp_path))
@@ -1,9 +1,10 @@
 """Lightweight tests for smripost_linc.utils.bids."""
 
 import os
+from pathlib import Path
 
 import pytest
-from bids.layout import BIDSLayout, BIDSLayoutIndexer
+from bids.layout import BIDSLayout, BIDSLayoutIndexer, Query
 
 from smripost_linc.tests.utils import get_test_data_path
 from smripost_linc.utils import bids as xbids
@@ -136,6 +137,144 @@ def test_collect_derivatives_full(full_ignore_list):
     check_expected(subject_data, expected)
 
 
+@pytest.fixture(scope='module')
+def anat_derivatives_layout(tmp_path_factory):
+    """Index a small derivatives dataset with anatomical files for two subjects."""
+    import json
+
+    dataset_dir = tmp_path_factory.mktemp('anat_derivatives')
+    (dataset_dir / 'dataset_description.json').write_text(
+        json.dumps({'Name': 'Test', 'BIDSVersion': '1.9.0', 'DatasetType': 'derivative'})
+    )
+    filenames = [
+        'desc-preproc_T1w.nii.gz',
+        'desc-preproc_T2w.nii.gz',
+        'space-MNI152NLin6Asym_res-2_desc-preproc_T1w.nii.gz',
+        'space-MNI152NLin6Asym_res-2_desc-preproc_T2w.nii.gz',
+        'part-mag_desc-preproc_T1w.nii.gz',
+        'dseg.nii.gz',
+        'from-T1w_to-MNI152NLin6Asym_mode-image_xfm.h5',
+        'hemi-L_space-fsaverage_desc-reg_sphere.surf.gii',
+        'hemi-R_space-fsaverage_desc-reg_sphere.surf.gii',
+    ]
+    for subject in ('01', '02'):
+        anat_dir = dataset_dir / f'sub-{subject}' / 'anat'
+        anat_dir.mkdir(parents=True)
+        for filename in filenames:
+            (anat_dir / f'sub-{subject}_{filename}').touch()
+
+    return BIDSLayout(dataset_dir, config=['bids', 'derivatives'], validate=False)
+
+
+@pytest.mark.parametrize(
+    ('query', 'regex_search'),
+    [
+        ({'suffix': 'T1w'}, False),
+        ({'suffix': ['T1w', 'T2w'], 'desc': 'preproc'}, False),
+        ({'space': None, 'suffix': 'T1w'}, False),
+        ({'part': ['mag', None], 'space': None, 'suffix': 'T1w'}, False),
+        ({'space': Query.NONE, 'desc': 'preproc'}, False),
+        ({'space': Query.ANY, 'suffix': ['T1w', 'T2w']}, False),
+        ({'space': Query.OPTIONAL, 'suffix': 'T1w'}, False),
+        ({'space': [], 'suffix': 'T2w'}, False),
+        ({'from': ['anat', 'T1w', 'T2w'], 'to': 'MNI152NLin6Asym', 'run': None}, False),
+        ({'hemi': 'L', 'extension': '.surf.gii'}, False),
+        ({'suffix': 't[12]w', 'space': 'MNI'}, True),
+        ({'desc': '^pre', 'part': None}, True),
+    ],
+)
+def test_filter_files_matches_pybids(anat_derivatives_layout, query, regex_search):
+    """Check that _filter_files selects the same files as BIDSLayout.get."""
+    layout = anat_derivatives_layout
+    query = {'subject': '01', **query}
+    files = xbids._get_subject_files(layout, '01')
+
+    expected = layout.get(return_type='filename', regex_search=regex_search, **query)
+    assert expected
+    assert xbids._filter_files(files, query, regex_search=regex_search) == expected
+    if not regex_search:
+        assert xbids._get_files(layout, query, {'01': files}) == expected
+
+
+def test_get_files_without_subject(anat_derivatives_layout):
+    """Check that queries spanning subjects are passed on to PyBIDS."""
+    layout = anat_derivatives_layout
+    query = {'desc': 'preproc', 'part': None, 'space': None, 'suffix': 'T1w'}
+    subject_files = {'01': xbids._get_subject_files(layout, '01')}
+    found = xbids._get_files(layout, query, subject_files)
+    assert found == layout.get(return_type='filename', **query)
+    assert len(found) == 2
+
+
+def test_load_subject_files(anat_derivatives_layout):
+    """Check that subject listings are cached by dataset root and configuration."""
+    root = anat_derivatives_layout.root
+    config_key = xbids._get_config_key(['bids', 'derivatives'])
+    layout = xbids._get_layout(Path(root), ['bids', 'derivatives'])
+
+    files = xbids._load_subject_files(root, config_key, '02')
+    assert files == xbids._get_subject_files(layout, '02')
+    assert xbids._load_subject_files(root, config_key, '02') is files
+    assert {os.path.basename(path)[:6] for path, _ in files} == {'sub-02'}
+
+
+def test_collect_atlases_nearest_companions(tmp_path):
+    """Check that atlas labels and metadata files match BIDSLayout.get_nearest."""
+    import json
+
+    from smripost_linc.data import load as load_data
+
+    (tmp_path / 'dataset_description.json').write_text(
+        json.dumps({'Name': 'Test', 'BIDSVersion': '1.9.0', 'DatasetType': 'atlas'})
+    )
+    labels = 'index\tlabel\n1\tA\n'
+    files = {
+        # Labels shared across spaces, and metadata that must match the resolution
+        'atlas-A/atlas-A_space-MNI152NLin6Asym_res-01_dseg.nii.gz': '',
+        'atlas-A/atlas-A_dseg.tsv': labels,
+        'atlas-A/atlas-A_space-MNI152NLin6Asym_res-02_dseg.json': '{"Name": "res-02"}',
+        'atlas-A/atlas-A_space-MNI152NLin6Asym_res-01_dseg.json': '{"Name": "res-01"}',
+        # The labels sharing the most entities win, and conflicting metadata is rejected
+        'atlas-B/atlas-B_space-fsLR_den-91k_dseg.dlabel.nii': '',
+        'atlas-B/atlas-B_dseg.tsv': labels,
+        'atlas-B/atlas-B_space-fsLR_den-91k_dseg.tsv': labels,
+        'atlas-B/atlas-B_space-fsLR_den-32k_dseg.tsv': labels,
+        'atlas-B/atlas-B_space-fsaverage_dseg.json': '{"Name": "fsaverage"}',
+        # Companions in a parent folder
+        'atlas-C/atlas-C_space-fsaverage_hemi-L_dseg.label.gii': '',
+        'atlas-C_dseg.tsv': labels,
+        'atlas-C_dseg.json': '{"Name": "C"}',
+        # A nearer folder with candidates is searched first, even without a match
+        'atlas-D/atlas-D_space-MNI152NLin6Asym_res-01_dseg.nii.gz': '',
+        'atlas-D/atlas-D_space-MNI152NLin6Asym_res-02_dseg.tsv': labels,
+        'atlas-D/atlas-D_space-MNI152NLin6Asym_res-02_dseg.json': '{"Name": "res-02"}',
+        'atlas-D_dseg.json': '{"Name": "D"}',
+    }
+    for filename, content in files.items():
+        (tmp_path / filename).parent.mkdir(exist_ok=True)
+        (tmp_path / filename).write_text(content)
+
+    layout = BIDSLayout(tmp_path, config=[load_data('atlas_bids_config.json')], validate=False)
+    atlases = ['A', 'B', 'C', 'D']
+    bids_filters = {'atlas': {'extension': ['.nii.gz', '.dlabel.nii', '.label.gii']}}
+    atlas_cache = xbids.collect_atlases({'atlases': layout}, atlases, bids_filters)
+    assert list(atlas_cache) == atlases
+
+    for atlas_info in atlas_cache.values():
+        image = atlas_info['image']
+        assert atlas_info['labels'] == layout.get_nearest(image, extension='.tsv', strict=False)
+
+        metadata_file = layout.get_nearest(image, extension='.json', strict=True)
+        metadata = json.loads(Path(metadata_file).read_text()) if metadata_file else None
+        assert atlas_info['metadata'] == metadata
+
+    assert atlas_cache['A']['metadata'] == {'Name': 'res-01'}
+    assert atlas_cache['B']['labels'].endswith('atlas-B_space-fsLR_den-91k_dseg.tsv')
+    assert atlas_cache['B']['metadata'] is None
+    assert atlas_cache['C']['labels'] == str(tmp_path / 'atlas-C_dseg.tsv')
+    assert atlas_cache['D']['metadata'] is None
+
+
 def check_expected(subject_data, expected):
     """Check expected values."""
     for key, value in expected.items():
@@ -0,0 +1,27 @@
+"""Tests for smripost_linc.utils.parcellation."""
+
+import numpy as np
+import pytest
+
+from smripost_linc.utils.parcellation import _create_colors
+
+
+@pytest.mark.parametrize('n_colors', [1, 2, 101, 2000])
+def test_create_colors(n_colors):
+    """Check that the colors are unique, and that only the unknown label is black."""
+    colors = _create_colors(n_colors)
+
+    assert colors.shape == (n_colors, 4)
+    assert colors.dtype == np.int32
+    assert np.unique(colors, axis=0).shape[0] == n_colors
+    assert not colors[0].any()
+    assert colors[1:, :3].any(axis=1).all()
+    assert not colors[:, 3].any()
+    assert colors.min() >= 0
+    assert colors.max() < 155
+
+
+def test_create_colors_seed():
+    """Check that seeded calls draw the same colors."""
+    np.testing.assert_array_equal(_create_colors(200, seed=0), _create_colors(200, seed=0))
+    assert not np.array_equal(_create_colors(200, seed=0), _create_colors(200, seed=1))
@@ -0,0 +1,234 @@
+"""Tests for smripost_linc.workflows.freesurfer."""
+
+import os
+
+import pytest
+from nipype.interfaces import freesurfer as fs
+
+from smripost_linc.tests.utils import chdir
+from smripost_linc.workflows.freesurfer import (
+    init_convert_metrics_to_cifti_wf,
+    init_parcellate_external_wf,
+    pair_segstats_inputs,
+    symlink_freesurfer_dir,
+)
+
+FREESURFER_FILES = [
+    'label/lh.aparc.annot',
+    'mri/aseg.mgz',
+    'mri/orig/001.mgz',
+    'mri/transforms/talairach.xfm',
+    'scripts/recon-all.log',
+    'stats/lh.aparc.stats',
+    'surf/lh.white',
+    'surf/rh.white',
+]
+
+
+def make_freesurfer_dir(path):
+    """Create a small FreeSurfer subject directory."""
+    for filename in FREESURFER_FILES:
+        (path / filename).parent.mkdir(parents=True, exist_ok=True)
+        (path / filename).write_text(filename)
+
+    return path
+
+
+def test_symlink_freesurfer_dir(tmp_path):
+    """Check that only the writable folders are created in the output directory."""
+    freesurfer_dir = make_freesurfer_dir(tmp_path / 'sub-01')
+    output_dir = tmp_path / 'out' / 'sub-01'
+
+    assert symlink_freesurfer_dir(freesurfer_dir, output_dir) == str(output_dir)
+
+    for name in ('label', 'mri', 'stats'):
+        assert not (output_dir / name).is_symlink()
+        assert (output_dir / name).is_dir()
+
+    for name in ('scripts', 'surf'):
+        assert (output_dir / name).is_symlink()
+        assert (output_dir / name).resolve() == freesurfer_dir / name
+
+    for filename in FREESURFER_FILES:
+        assert (output_dir / filename).read_text() == filename
+
+    # New files in the writable folders do not reach the input directory
+    (output_dir / 'label' / 'lh.4S156Parcels.annot').write_text('new')
+    assert not (freesurfer_dir / 'label' / 'lh.4S156Parcels.annot').exists()
+
+
+def test_symlink_freesurfer_dir_rerun(tmp_path):
+    """Check that linking into an existing output directory keeps the existing files."""
+    freesurfer_dir = make_freesurfer_dir(tmp_path / 'sub-01')
+    output_dir = tmp_path / 'out'
+    symlink_freesurfer_dir(freesurfer_dir, output_dir)
+    (output_dir / 'label' / 'lh.4S156Parcels.annot').write_text('new')
+
+    (freesurfer_dir / 'label' / 'rh.aparc.annot').write_text('label/rh.aparc.annot')
+    symlink_freesurfer_dir(freesurfer_dir, output_dir)
+
+    assert (output_dir / 'label' / 'lh.4S156Parcels.annot').read_text() == 'new'
+    assert (output_dir / 'label' / 'rh.aparc.annot').read_text() == 'label/rh.aparc.annot'
+    assert (output_dir / 'surf').is_symlink()
+    assert sorted(os.listdir(output_dir)) == ['label', 'mri', 'scripts', 'stats', 'surf']
+
+
+def test_symlink_freesurfer_dir_cwd(tmp_path):
+    """Check that the current directory is used by default."""
+    freesurfer_dir = make_freesurfer_dir(tmp_path / 'sub-01')
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    with chdir(output_dir):
+        assert symlink_freesurfer_dir(freesurfer_dir) == str(output_dir)
+
+    assert (output_dir / 'surf' / 'lh.white').read_text() == 'surf/lh.white'
+
+
+def test_symlink_freesurfer_dir_hardlinks(tmp_path):
+    """Check that files in the writable folders are hardlinked on the same filesystem."""
+    freesurfer_dir = make_freesurfer_dir(tmp_path / 'sub-01')
+    output_dir = tmp_path / 'out'
+    symlink_freesurfer_dir(freesurfer_dir, output_dir)
+
+    for filename in FREESURFER_FILES:
+        if filename.startswith(('label/', 'mri/', 'stats/')):
+            assert not (output_dir / filename).is_symlink()
+            assert (output_dir / filename).samefile(freesurfer_dir / filename)
+
+    # Nested folders are mirrored too
+    assert not (output_dir / 'mri' / 'orig').is_symlink()
+
+
+def test_symlink_freesurfer_dir_symlink_fallback(tmp_path, monkeypatch):
+    """Check that files are symlinked when hardlinks are refused."""
+
+    def _refuse_link(src, dst):
+        raise PermissionError(f'Operation not permitted: {src!r} -> {dst!r}')
+
+    monkeypatch.setattr(os, 'link', _refuse_link)
+
+    freesurfer_dir = make_freesurfer_dir(tmp_path / 'sub-01')
+    output_dir = tmp_path / 'out'
+    symlink_freesurfer_dir(freesurfer_dir, output_dir)
+
+    for filename in FREESURFER_FILES:
+        if filename.startswith(('label/', 'mri/', 'stats/')):
+            assert (output_dir / filename).is_symlink()
+            assert (output_dir / filename).resolve() == freesurfer_dir / filename
+
+    assert not (output_dir / 'mri' / 'orig').is_symlink()
+
+
+def test_pair_segstats_inputs():
+    """Check that each file is paired with each atlas, grouped by atlas in the given order."""
+    atlases = ['4S156Parcels', 'Glasser', 'Gordon']
+    files = ['/fs/surf/lh.w-g.pct.mgh', '/fs/surf/lh.pial_lgi']
+    names = ['gwr', 'lgi']
+    arguments = ['--snr', '--median']
+
+    in_file, slabel, args, annot, atlas = pair_segstats_inputs(
+        '01', 'lh', atlases, files, names, arguments
+    )
+
+    n_pairs = len(atlases) * len(files)
+    for outputs in (in_file, slabel, args, annot, atlas):
+        assert len(outputs) == n_pairs
+
+    expected = [
+        (file_, name, argument, atlas_)
+        for atlas_ in atlases
+        for file_, name, argument in zip(files, names, arguments)
+    ]
+    assert list(zip(in_file, slabel, args, atlas)) == expected
+    assert annot == [('01', 'lh', atlas_) for atlas_ in atlas]
+
+    # Atlases appear in the order used for the ds_parcstats_tsv segmentation list
+    assert list(dict.fromkeys(atlas)) == atlases
+
+
+def test_pair_segstats_inputs_mapnode(tmp_path):
+    """Check that the paired lists keep their order through MapNode iterfields."""
+    from nipype.interfaces import utility as niu
+    from nipype.pipeline import engine as pe
+
+    def _describe(in_file, slabel, args, annot, atlas):
+        return f'{annot[1]}.{atlas}: {slabel}={in_file} {args}'
+
+    atlases = ['4S156Parcels', 'Glasser']
+    workflow = pe.Workflow(name='pair_segstats_wf', base_dir=str(tmp_path))
+    prepare_segstats_args = pe.Node(
+        niu.Function(
+            input_names=['subject_id', 'hemi', 'atlases', 'files', 'names', 'arguments'],
+            output_names=['in_file', 'slabel', 'args', 'annot', 'atlas'],
+            function=pair_segstats_inputs,
+        ),
+        name='prepare_segstats_args',
+    )
+    prepare_segstats_args.inputs.subject_id = '01'
+    prepare_segstats_args.inputs.hemi = 'rh'
+    prepare_segstats_args.inputs.atlases = atlases
+    prepare_segstats_args.inputs.files = ['rh.w-g.pct.mgh', 'rh.pial_lgi']
+    prepare_segstats_args.inputs.names = ['gwr', 'lgi']
+    prepare_segstats_args.inputs.arguments = ['--snr', '--median']
+
+    fields = ['in_file', 'slabel', 'args', 'annot', 'atlas']
+    describe = pe.MapNode(
+        niu.Function(input_names=fields, output_names=['out'], function=_describe),
+        name='describe',
+        iterfield=fields,
+    )
+    workflow.connect([
+        (prepare_segstats_args, describe, [(field, field) for field in fields]),
+    ])  # fmt:skip
+
+    results = {node.name: node for node in workflow.run().nodes()}
+    assert results['describe'].result.outputs.out == [
+        'rh.4S156Parcels: gwr=rh.w-g.pct.mgh --snr',
+        'rh.4S156Parcels: lgi=rh.pial_lgi --median',
+        'rh.Glasser: gwr=rh.w-g.pct.mgh --snr',
+        'rh.Glasser: lgi=rh.pial_lgi --median',
+    ]
+
+
+@pytest.mark.skipif(
+    'noglobal' not in fs.ParcellationStats.input_spec().trait_names(),
+    reason='ParcellationStats has no noglobal input in this version of nipype',
+)
+def test_init_parcellate_external_wf_atlas_dict():
+    """Check that the workflow can be built from the atlases returned by collect_atlases."""
+    atlases = {
+        atlas: {
+            'dataset': 'atlases',
+            'image': f'/atlases/atlas-{atlas}/atlas-{atlas}_space-fsaverage_dseg.label.gii',
+            'labels': f'/atlases/atlas-{atlas}/atlas-{atlas}_dseg.tsv',
+            'metadata': None,
+            'space': 'fsaverage',
+            'format': 'gifti',
+        }
+        for atlas in ('4S156Parcels', 'Glasser')
+    }
+
+    workflow = init_parcellate_external_wf(
+        name_source='/data/sub-01/anat/sub-01_T1w.nii.gz',
+        atlases=atlases,
+        mem_gb={'resampled': 2},
+    )
+
+    for hemi in ('lh', 'rh'):
+        atlas_names = ['4S156Parcels', 'Glasser']
+        assert workflow.get_node(f'prepare_segstats_args_{hemi}').inputs.atlases == atlas_names
+        assert workflow.get_node(f'parcstats_to_tsv_{hemi}').inputs.atlas == atlas_names
+        assert workflow.get_node(f'ds_parcstats_tsv_{hemi}').inputs.segmentation == atlas_names
+
+
+def test_init_convert_metrics_to_cifti_wf():
+    """Check that each metric is warped to fsLR in its own MapNode job."""
+    from nipype.pipeline import engine as pe
+
+    workflow = init_convert_metrics_to_cifti_wf()
+
+    for hemi in ('lh', 'rh'):
+        warp_fsaverage_to_fslr = workflow.get_node(f'warp_fsaverage_to_fslr_{hemi}')
+        assert isinstance(warp_fsaverage_to_fslr, pe.MapNode)
+        assert warp_fsaverage_to_fslr.iterfield == ['in_file']
+        assert warp_fsaverage_to_fslr.inputs.hemi == hemi
@@ -2,6 +2,7 @@
 
 import os
 import subprocess
+import sys
 import tarfile
 from contextlib import contextmanager
 from glob import glob
@@ -204,3 +205,28 @@ def get_test_data_path():
     Based on function by Yaroslav Halchenko used in Neurosynth Python package.
     """
     return Path(__file__).resolve().parent.parent.parent.parent / 'tests' / 'data'
+
+
+def run_pickled_interface(pickled_file, work_dir, node_name=''):
+    """Unpickle and run an interface in a fresh interpreter, as the CLI does.
+
+    If ``node_name`` is given, the pickled object is a workflow,
+    and the interface of that node is run.
+    Returns the basename of the interface's ``out_file`` output.
+    """
+    script = (
+        'import os, pickle, sys\n'
+        "with open(sys.argv[1], 'rb') as fobj:\n"
+        '    interface = pickle.load(fobj)\n'
+        'if sys.argv[3]:\n'
+        '    interface = interface.get_node(sys.argv[3]).interface\n'
+        'os.chdir(sys.argv[2])\n'
+        'print(os.path.basename(interface.run().outputs.out_file))\n'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', script, str(pickled_file), str(work_dir), node_name],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return result.stdout.strip().splitlines()[-1]
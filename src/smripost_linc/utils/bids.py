@@ -3,17 +3,42 @@
 from __future__ import annotations
 
 import json
+import re
 from collections import defaultdict
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from bids.layout import BIDSLayout
-from bids.utils import listify
+from bids.layout import BIDSLayout, Query
+from bids.layout.models import BIDSFile, Tag
+from bids.utils import listify, natural_sort
 from nipype.interfaces.base import isdefined
 from nipype.interfaces.utility.base import _ravel
-from niworkflows.utils.spaces import SpatialReferences
 
 from smripost_linc.data import load as load_data
 
+try:  # orjson is optional, but decodes JSON several times faster than the stdlib
+    import orjson
+except ImportError:
+    orjson = None
+
+if TYPE_CHECKING:
+    from niworkflows.utils.spaces import SpatialReferences
+
+_ATLAS_FORMATS = {
+    '.nii': 'nifti',
+    '.nii.gz': 'nifti',
+    '.label.gii': 'gifti',
+    '.dlabel.nii': 'cifti',
+}
+
+
+def _read_json(path):
+    """Load a JSON file, using orjson when it is available."""
+    data = Path(path).read_bytes()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
 
 def extract_entities(file_list: str | list[str]) -> dict:
     """Return a dictionary of common entities given a list of files.
@@ -39,25 +64,29 @@ def extract_entities(file_list: str | list[str]) -> dict:
     {'subject': '01', 'run': [1, 2], 'suffix': 'T1w', 'datatype': 'anat', 'extension': '.nii.gz'}
 
     """
-    from collections import defaultdict
-
-    from bids.layout import parse_file_entities
-
     entities = defaultdict(list)
-    for e, v in [
-        ev_pair for f in listify(file_list) for ev_pair in parse_file_entities(f).items()
-    ]:
-        entities[e].append(v)
+    for f in listify(file_list):
+        for e, v in _parse_file_entities(str(f)):
+            entities[e].append(v)
 
     def _unique(inlist):
-        inlist = sorted(set(inlist))
-        if len(inlist) == 1:
-            return inlist[0]
-        return inlist
+        # Most entities are shared by every file, so skip building a set for those
+        first = inlist[0]
+        if all(x == first for x in inlist[1:]):
+            return first
+        return sorted(set(inlist))
 
     return {k: _unique(v) for k, v in entities.items()}
 
 
+@lru_cache(maxsize=4096)
+def _parse_file_entities(path):
+    """Parse (and memoize) the BIDS entities of a filename, as ``(entity, value)`` pairs."""
+    from bids.layout import parse_file_entities
+
+    return tuple(parse_file_entities(path).items())
+
+
 def collect_derivatives(
     raw_dataset: Path | BIDSLayout | None,
     derivatives_dataset: Path | BIDSLayout | None,
@@ -102,7 +131,7 @@ def collect_derivatives(
 
     _spec = None
     if spec is None or patterns is None:
-        _spec = json.loads(load_data.readable('io_spec.json').read_text())
+        _spec = _read_json(load_data('io_spec.json'))
 
         if spec is None:
             spec = _spec['queries']
@@ -116,49 +145,37 @@ def collect_derivatives(
     if _spec:
         config = ['bids', 'derivatives', _spec]
 
+    # Anatomical derivatives may be at the session level or the subject level
+    anat_entities = {'session': [entities.get('session'), None]}
+
     # Search for derivatives data
     derivs_cache = defaultdict(list, {})
     if derivatives_dataset is not None:
         layout = derivatives_dataset
+        # Fetch the subject's files once, rather than running one SQL query per
+        # derivative, transform, and output space
+        subject = entities.get('subject')
+        subject_files = None
         if isinstance(layout, Path):
-            layout = BIDSLayout(
-                layout,
-                config=config,
-                validate=False,
-            )
-
-        for k, q in spec['derivatives'].items():
-            if k.startswith('anat'):
-                # Allow anatomical derivatives at session level or subject level
-                query = {**{'session': [entities.get('session'), None]}, **q}
-            else:
-                # Combine entities with query. Query values override file entities.
-                query = {**entities, **q}
-
-            item = layout.get(return_type='filename', **query)
-            if not item:
-                derivs_cache[k] = None
-            elif not allow_multiple and len(item) > 1 and k.startswith('anat'):
-                # Anatomical derivatives are allowed to have multiple files (e.g., T1w and T2w)
-                # but we just grab the first one
-                derivs_cache[k] = item[0]
-            elif not allow_multiple and len(item) > 1:
-                raise ValueError(f'Multiple files found for {k}: {item}')
-            else:
-                derivs_cache[k] = item[0] if len(item) == 1 else item
-
-        for k, q in spec['transforms'].items():
+            root, config_key = str(layout), _get_config_key(config)
+            layout = _load_layout(root, config_key)
+            if isinstance(subject, str):
+                subject_files = {subject: _load_subject_files(root, config_key, subject)}
+        elif isinstance(subject, str):
+            subject_files = {subject: _get_subject_files(layout, subject)}
+
+        for k, q in chain(spec['derivatives'].items(), spec['transforms'].items()):
             if k.startswith('anat'):
                 # Allow anatomical derivatives at session level or subject level
-                query = {**{'session': [entities.get('session'), None]}, **q}
+                query = anat_entities | q
             else:
                 # Combine entities with query. Query values override file entities.
-                query = {**entities, **q}
+                query = entities | q
 
             if k == 'boldref2fmap':
                 query['to'] = fieldmap_id
 
-            item = layout.get(return_type='filename', **query)
+            item = _get_files(layout, query, subject_files)
             if not item:
                 derivs_cache[k] = None
             elif not allow_multiple and len(item) > 1 and k.startswith('anat'):
@@ -175,18 +192,16 @@ def collect_derivatives(
         # Put the output-space files/transforms in lists so they can be parallelized with
         # template_iterator_wf.
         spaces_found, bold_outputspaces, bold_mask_outputspaces = [], [], []
+        bold_base = entities | spec['derivatives']['bold_mni152nlin6asym']
+        mask_base = entities | spec['derivatives']['bold_mask_mni152nlin6asym']
         for space in spaces.references:
             # First try to find processed BOLD+mask files in the requested space
-            bold_query = {**entities, **spec['derivatives']['bold_mni152nlin6asym']}
-            bold_query['space'] = space.space
-            bold_query = {**bold_query, **space.spec}
-            bold_item = layout.get(return_type='filename', **bold_query)
+            bold_query = bold_base | {'space': space.space} | space.spec
+            bold_item = _get_files(layout, bold_query, subject_files)
             bold_outputspaces.append(bold_item[0] if bold_item else None)
 
-            mask_query = {**entities, **spec['derivatives']['bold_mask_mni152nlin6asym']}
-            mask_query['space'] = space.space
-            mask_query = {**mask_query, **space.spec}
-            mask_item = layout.get(return_type='filename', **mask_query)
+            mask_query = mask_base | {'space': space.space} | space.spec
+            mask_item = _get_files(layout, mask_query, subject_files)
             bold_mask_outputspaces.append(mask_item[0] if mask_item else None)
 
             spaces_found.append(bool(bold_item) and bool(mask_item))
@@ -203,14 +218,11 @@ def collect_derivatives(
             )
 
         spaces_found, anat2outputspaces_xfm = [], []
+        anat2space_base = anat_entities | spec['transforms']['anat2mni152nlin6asym']
         for space in spaces.references:
             # Now try to find transform to the requested space
-            anat2space_query = {
-                **{'session': [entities.get('session'), None]},
-                **spec['transforms']['anat2mni152nlin6asym'],
-            }
-            anat2space_query['to'] = space.space
-            item = layout.get(return_type='filename', **anat2space_query)
+            anat2space_query = anat2space_base | {'to': space.space}
+            item = _get_files(layout, anat2space_query, subject_files)
             anat2outputspaces_xfm.append(item[0] if item else None)
             spaces_found.append(bool(item))
 
@@ -227,13 +239,13 @@ def collect_derivatives(
     # Search for raw BOLD data
     if not derivs_cache and raw_dataset is not None:
         if isinstance(raw_dataset, Path):
-            raw_layout = BIDSLayout(raw_dataset, config=['bids'], validate=False)
+            raw_layout = _get_layout(raw_dataset, ['bids'])
         else:
             raw_layout = raw_dataset
 
         for k, q in spec['raw'].items():
             # Combine entities with query. Query values override file entities.
-            query = {**entities, **q}
+            query = entities | q
             item = raw_layout.get(return_type='filename', **query)
             if not item:
                 derivs_cache[k] = None
@@ -245,6 +257,139 @@ def collect_derivatives(
     return derivs_cache
 
 
+def _get_layout(root, config):
+    """Return a BIDSLayout for ``root``, indexing each dataset only once per process.
+
+    Parameters
+    ----------
+    root : Path | str
+        Path to the dataset.
+    config : list of str, Path, or dict
+        PyBIDS configurations, as accepted by :class:`~bids.layout.BIDSLayout`.
+
+    Returns
+    -------
+    layout : BIDSLayout
+        A layout shared by every caller that requests the same dataset and configuration.
+    """
+    return _load_layout(str(root), _get_config_key(config))
+
+
+def _get_config_key(config):
+    """Convert PyBIDS configurations into a hashable key for the layout caches."""
+    return tuple(json.dumps(c, sort_keys=True) if isinstance(c, dict) else str(c) for c in config)
+
+
+@lru_cache(maxsize=16)
+def _load_layout(root, config_key):
+    config = [json.loads(c) if c.startswith('{') else c for c in config_key]
+    return BIDSLayout(root, config=config, validate=False)
+
+
+def _get_files(layout, query, subject_files=None):
+    """Run a PyBIDS query, returning the matching filenames.
+
+    Queries for a subject in ``subject_files`` (a mapping of subject labels
+    to the output of :func:`_get_subject_files`) are answered by filtering
+    that subject's files in Python.
+    Any other query is passed to :meth:`~bids.layout.BIDSLayout.get`.
+    """
+    subject = query.get('subject')
+    if subject_files and isinstance(subject, str) and subject in subject_files:
+        return _filter_files(subject_files[subject], query)
+
+    return layout.get(return_type='filename', **query)
+
+
+@lru_cache(maxsize=64)
+def _load_subject_files(root, config_key, subject):
+    """List a subject's files in the layout cached by :func:`_load_layout`.
+
+    The listing is memoized on the same ``(root, config_key)`` key as the layout,
+    so collecting derivatives for each run of a subject only queries a given dataset once,
+    without the cache holding on to the layout itself.
+    """
+    return _get_subject_files(_load_layout(root, config_key), subject)
+
+
+def _get_subject_files(layout, subject):
+    """List the ``(path, entities)`` pairs of a subject's files in a layout.
+
+    The tags of all files are loaded along with the files, in a single query,
+    rather than lazily with one query per file.
+    """
+    # SQLAlchemy is a dependency of PyBIDS
+    from sqlalchemy.orm import aliased, selectinload
+
+    subject_tag = aliased(Tag)
+    files = (
+        layout.session.query(BIDSFile)
+        .filter_by(is_dir=False)
+        .join(
+            subject_tag,
+            (subject_tag.file_path == BIDSFile.path) & (subject_tag.entity_name == 'subject'),
+        )
+        .filter(subject_tag._value == subject)
+        .options(selectinload(BIDSFile.tags))
+    )
+    return tuple((f.path, f.entities) for f in files)
+
+
+def _filter_files(files, query, regex_search=False):
+    """Select the paths from ``(path, entities)`` pairs that match a PyBIDS-style query.
+
+    Query values may be a single value or a list of accepted values.
+    ``None`` (or ``Query.NONE``) requires the entity to be absent,
+    ``Query.ANY`` requires it to be present,
+    and ``Query.OPTIONAL`` (or an empty list) does not filter on the entity at all.
+    As in PyBIDS, ``regex_search`` matches values as case-insensitive regular expressions.
+
+    Examples
+    --------
+    >>> files = [
+    ...     ('/d/sub-01_desc-preproc_T1w.nii.gz', {'desc': 'preproc', 'suffix': 'T1w'}),
+    ...     ('/d/sub-01_space-MNI_desc-preproc_T1w.nii.gz',
+    ...      {'space': 'MNI', 'desc': 'preproc', 'suffix': 'T1w'}),
+    ... ]
+    >>> _filter_files(files, {'space': None, 'suffix': ['T1w', 'T2w']})
+    ['/d/sub-01_desc-preproc_T1w.nii.gz']
+    >>> _filter_files(files, {'space': Query.ANY, 'desc': 'preproc'})
+    ['/d/sub-01_space-MNI_desc-preproc_T1w.nii.gz']
+    """
+    query = {
+        key: list(value) if isinstance(value, list | tuple) else [value]
+        for key, value in query.items()
+    }
+    query = {
+        key: values for key, values in query.items() if values and Query.OPTIONAL not in values
+    }
+    matches = [
+        path
+        for path, entities in files
+        if all(
+            any(_entity_matches(entities, key, value, regex_search) for value in values)
+            for key, values in query.items()
+        )
+    ]
+    return natural_sort(matches)
+
+
+def _entity_matches(entities, key, value, regex_search=False):
+    """Check a single entity against one accepted query value."""
+    if value is None or value is Query.NONE:
+        return key not in entities
+    elif key not in entities:
+        return False
+    elif value is Query.ANY:
+        return True
+
+    found = entities[key]
+    if regex_search:
+        return re.search(str(value), str(found), re.IGNORECASE) is not None
+
+    return found == value or str(found) == str(value)
+
+
 def collect_atlases(datasets, atlases, bids_filters=None):
     """Collect atlases from a list of BIDS-Atlas datasets.
 
@@ -276,12 +421,7 @@ def collect_atlases(datasets, atlases, bids_filters=None):
         - "metadata" : dict
             Metadata associated with the atlas.
     """
-    import json
-
     import pandas as pd
-    from bids.layout import BIDSLayout
-
-    from smripost_linc.data import load as load_data
 
     atlas_cfg = load_data('atlas_bids_config.json')
     bids_filters = bids_filters or {}
@@ -293,51 +433,65 @@ def collect_atlases(datasets, atlases, bids_filters=None):
     atlas_cache = {}
     for dataset_name, dataset_path in datasets.items():
         if not isinstance(dataset_path, BIDSLayout):
-            layout = BIDSLayout(dataset_path, config=[atlas_cfg], validate=False)
+            layout = _get_layout(dataset_path, [atlas_cfg])
         else:
             layout = dataset_path
 
         if layout.get_dataset_description().get('DatasetType') != 'atlas':
             continue
 
+        # Index the labels and metadata files by suffix, extension, and folder in one query,
+        # instead of calling layout.get_nearest twice per atlas.
+        entity_names = set(layout.get_entities(metadata=False))
+        companions = defaultdict(lambda: defaultdict(list))
+        for f in layout.get(extension=['.tsv', '.json'], return_type='object'):
+            key = (f.entities.get('suffix'), f.entities['extension'])
+            companions[key][Path(f.path).parent].append((f.path, f.entities))
+
         for atlas in atlases:
             atlas_images = layout.get(
                 atlas=atlas,
                 **atlas_filter,
-                return_type='file',
+                return_type='object',
             )
             if not atlas_images:
                 continue
             elif len(atlas_images) > 1:
-                bulleted_list = '\n'.join([f'  - {img}' for img in atlas_images])
+                bulleted_list = '\n'.join([f'  - {img.path}' for img in atlas_images])
                 print(
                     f'Multiple atlas images found for {atlas} with query {atlas_filter}:\n'
-                    f'{bulleted_list}\nUsing {atlas_images[0]}.'
+                    f'{bulleted_list}\nUsing {atlas_images[0].path}.'
                 )
 
             if atlas in atlas_cache:
                 raise ValueError(f"Multiple datasets contain the same atlas '{atlas}'")
 
-            atlas_image = atlas_images[0]
-            atlas_labels = layout.get_nearest(atlas_image, extension='.tsv', strict=False)
-            atlas_metadata_file = layout.get_nearest(atlas_image, extension='.json', strict=True)
+            atlas_file = atlas_images[0]
+            atlas_image = atlas_file.path
+            image_entities = {k: v for k, v in atlas_file.entities.items() if k in entity_names}
+            suffix = image_entities.get('suffix')
+            atlas_labels = _find_nearest_companion(
+                companions[(suffix, '.tsv')],
+                atlas_image,
+                image_entities,
+                strict=False,
+            )
+            atlas_metadata_file = _find_nearest_companion(
+                companions[(suffix, '.json')],
+                atlas_image,
+                image_entities,
+                strict=True,
+            )
 
             if not atlas_labels:
                 raise FileNotFoundError(f'No TSV file found for {atlas_image}')
 
             atlas_metadata = None
             if atlas_metadata_file:
-                with open(atlas_metadata_file) as f_obj:
-                    atlas_metadata = json.load(f_obj)
+                atlas_metadata = _read_json(atlas_metadata_file)
 
-            atlas_file = layout.get_file(atlas_image)
             extension = atlas_file.entities['extension']
-            file_format = {
-                '.nii': 'nifti',
-                '.nii.gz': 'nifti',
-                '.label.gii': 'gifti',
-                '.dlabel.nii': 'cifti',
-            }.get(extension, 'unknown')
+            file_format = _ATLAS_FORMATS.get(extension, 'unknown')
 
             atlas_cache[atlas] = {
                 'dataset': dataset_name,
@@ -359,17 +513,64 @@ def collect_atlases(datasets, atlases, bids_filters=None):
         if atlas_info['format'] == 'unknown':
             raise ValueError(f"Unknown format for atlas '{_atlas}' (extension='{extension}')")
 
-        # Check the contents of the labels file
-        df = pd.read_table(atlas_info['labels'])
-        if 'label' not in df.columns:
+        # Check the columns of the labels file, which only requires the header
+        columns = pd.read_table(atlas_info['labels'], nrows=0).columns
+        if 'label' not in columns:
             raise ValueError(f"'label' column not found in {atlas_info['labels']}")
 
-        if 'index' not in df.columns:
+        if 'index' not in columns:
             raise ValueError(f"'index' column not found in {atlas_info['labels']}")
 
     return atlas_cache
 
 
+def _find_nearest_companion(candidates, path, entities, strict):
+    """Find the file nearest to ``path`` among prefetched candidates.
+
+    This follows :meth:`bids.layout.BIDSLayout.get_nearest`: folders are searched from
+    the file's own folder up to the root, and within the first folder with candidates,
+    files are ranked by the number of entities they share with ``path``.
+    When ``strict`` is True, candidates with any conflicting entity (other than the
+    extension) are rejected.
+
+    Parameters
+    ----------
+    candidates : dict of (Path, list of (str, dict))
+        Candidate ``(path, entities)`` pairs, keyed by their parent folder.
+    path : str
+        The file to search from.
+    entities : dict
+        The entities of ``path``.
+    strict : bool
+        Whether all shared entities must match.
+
+    Returns
+    -------
+    nearest : str or None
+        The nearest matching file, or None if there is no match.
+    """
+    if strict:
+        entities = {k: v for k, v in entities.items() if k != 'extension'}
+
+    for folder in Path(path).absolute().parents:
+        if not candidates.get(folder):
+            continue
+
+        ranked = []
+        for candidate, candidate_entities in candidates[folder]:
+            shared = entities.keys() & candidate_entities.keys()
+            n_matches = sum(entities[k] == candidate_entities[k] for k in shared)
+            if strict and n_matches != len(shared):
+                continue
+
+            ranked.append((n_matches, candidate))
+
+        ranked.sort(key=lambda x: x[0], reverse=True)
+        return ranked[0][1] if ranked else None
+
+    return None
+
+
 def write_bidsignore(deriv_dir):
     bids_ignore = (
         '*.html',
@@ -402,7 +603,6 @@ def write_derivative_description(input_dir, output_dir, dataset_links=None):
     dataset_links : :obj:`dict`, optional
         Dictionary of dataset links to include in the dataset description.
     """
-    import json
     import os
 
     from packaging.version import Version
@@ -418,8 +618,17 @@ def write_derivative_description(input_dir, output_dir, dataset_links=None):
     if not os.path.isfile(orig_dset_description):
         raise FileNotFoundError(f'Dataset description does not exist: {orig_dset_description}')
 
-    with open(orig_dset_description) as fobj:
-        desc = json.load(fobj)
+    # An existing description is never overwritten, so don't bother assembling a new one
+    out_desc = output_dir / 'dataset_description.json'
+    if out_desc.is_file():
+        old_desc = _read_json(out_desc)
+        old_version = old_desc['GeneratedBy'][0]['Version']
+        if Version(__version__).public != Version(old_version).public:
+            print(f'Previous output generated by version {old_version} found.')
+
+        return
+
+    desc = _read_json(orig_dset_description)
 
     # Update dataset description
     desc['Name'] = 'sMRIPost-LINC- Anatomical Postprocessing Outputs'
@@ -435,8 +644,7 @@ def write_derivative_description(input_dir, output_dir, dataset_links=None):
         if name not in ('templateflow', 'input'):
             dataset_desc = Path(link) / 'dataset_description.json'
             if dataset_desc.is_file():
-                with open(dataset_desc) as fobj:
-                    dataset_desc_dict = json.load(fobj)
+                dataset_desc_dict = _read_json(dataset_desc)
 
                 if 'GeneratedBy' in dataset_desc_dict:
                     desc['GeneratedBy'].insert(0, dataset_desc_dict['GeneratedBy'][0])
@@ -476,73 +684,72 @@ def write_derivative_description(input_dir, output_dir, dataset_links=None):
 
         desc['DatasetLinks'][k] = str(v)
 
-    out_desc = Path(output_dir / 'dataset_description.json')
-    if out_desc.is_file():
-        old_desc = json.loads(out_desc.read_text())
-        old_version = old_desc['GeneratedBy'][0]['Version']
-        if Version(__version__).public != Version(old_version).public:
-            print(f'Previous output generated by version {old_version} found.')
-    else:
-        out_desc.write_text(json.dumps(desc, indent=4))
+    with out_desc.open('w') as fobj:
+        json.dump(desc, fobj, indent=4)
+
+
+# Validator issue codes that should not influence sMRIPost-LINC
+_VALIDATOR_IGNORE = (
+    'EVENTS_COLUMN_ONSET',
+    'EVENTS_COLUMN_DURATION',
+    'TSV_EQUAL_ROWS',
+    'TSV_EMPTY_CELL',
+    'TSV_IMPROPER_NA',
+    'VOLUME_COUNT_MISMATCH',
+    'BVAL_MULTIPLE_ROWS',
+    'BVEC_NUMBER_ROWS',
+    'DWI_MISSING_BVAL',
+    'INCONSISTENT_SUBJECTS',
+    'INCONSISTENT_PARAMETERS',
+    'BVEC_ROW_LENGTH',
+    'B_FILE',
+    'PARTICIPANT_ID_COLUMN',
+    'PARTICIPANT_ID_MISMATCH',
+    'TASK_NAME_MUST_DEFINE',
+    'PHENOTYPE_SUBJECTS_MISSING',
+    'STIMULUS_FILE_MISSING',
+    'DWI_MISSING_BVEC',
+    'EVENTS_TSV_MISSING',
+    'TSV_IMPROPER_NA',
+    'ACQTIME_FMT',
+    'Participants age 89 or higher',
+    'DATASET_DESCRIPTION_JSON_MISSING',
+    'FILENAME_COLUMN',
+    'WRONG_NEW_LINE',
+    'MISSING_TSV_COLUMN_CHANNELS',
+    'MISSING_TSV_COLUMN_IEEG_CHANNELS',
+    'MISSING_TSV_COLUMN_IEEG_ELECTRODES',
+    'UNUSED_STIMULUS',
+    'CHANNELS_COLUMN_SFREQ',
+    'CHANNELS_COLUMN_LOWCUT',
+    'CHANNELS_COLUMN_HIGHCUT',
+    'CHANNELS_COLUMN_NOTCH',
+    'CUSTOM_COLUMN_WITHOUT_DESCRIPTION',
+    'ACQTIME_FMT',
+    'SUSPICIOUSLY_LONG_EVENT_DESIGN',
+    'SUSPICIOUSLY_SHORT_EVENT_DESIGN',
+    'MALFORMED_BVEC',
+    'MALFORMED_BVAL',
+    'MISSING_TSV_COLUMN_EEG_ELECTRODES',
+    'MISSING_SESSION',
+)
+# The ignore list never changes, so serialize it once and leave the per-run fields to fill in
+_VALIDATOR_CONFIG_TEMPLATE = (
+    '{"ignore": ' + json.dumps(_VALIDATOR_IGNORE) + ', "error": %s, "ignoredFiles": %s}'
+)
 
 
 def validate_input_dir(exec_env, bids_dir, participant_label, need_T1w=True):
-    # Ignore issues and warnings that should not influence FMRIPREP
+    import os
     import subprocess
     import sys
     import tempfile
 
-    validator_config_dict = {
-        'ignore': [
-            'EVENTS_COLUMN_ONSET',
-            'EVENTS_COLUMN_DURATION',
-            'TSV_EQUAL_ROWS',
-            'TSV_EMPTY_CELL',
-            'TSV_IMPROPER_NA',
-            'VOLUME_COUNT_MISMATCH',
-            'BVAL_MULTIPLE_ROWS',
-            'BVEC_NUMBER_ROWS',
-            'DWI_MISSING_BVAL',
-            'INCONSISTENT_SUBJECTS',
-            'INCONSISTENT_PARAMETERS',
-            'BVEC_ROW_LENGTH',
-            'B_FILE',
-            'PARTICIPANT_ID_COLUMN',
-            'PARTICIPANT_ID_MISMATCH',
-            'TASK_NAME_MUST_DEFINE',
-            'PHENOTYPE_SUBJECTS_MISSING',
-            'STIMULUS_FILE_MISSING',
-            'DWI_MISSING_BVEC',
-            'EVENTS_TSV_MISSING',
-            'TSV_IMPROPER_NA',
-            'ACQTIME_FMT',
-            'Participants age 89 or higher',
-            'DATASET_DESCRIPTION_JSON_MISSING',
-            'FILENAME_COLUMN',
-            'WRONG_NEW_LINE',
-            'MISSING_TSV_COLUMN_CHANNELS',
-            'MISSING_TSV_COLUMN_IEEG_CHANNELS',
-            'MISSING_TSV_COLUMN_IEEG_ELECTRODES',
-            'UNUSED_STIMULUS',
-            'CHANNELS_COLUMN_SFREQ',
-            'CHANNELS_COLUMN_LOWCUT',
-            'CHANNELS_COLUMN_HIGHCUT',
-            'CHANNELS_COLUMN_NOTCH',
-            'CUSTOM_COLUMN_WITHOUT_DESCRIPTION',
-            'ACQTIME_FMT',
-            'SUSPICIOUSLY_LONG_EVENT_DESIGN',
-            'SUSPICIOUSLY_SHORT_EVENT_DESIGN',
-            'MALFORMED_BVEC',
-            'MALFORMED_BVAL',
-            'MISSING_TSV_COLUMN_EEG_ELECTRODES',
-            'MISSING_SESSION',
-        ],
-        'error': ['NO_T1W'] if need_T1w else [],
-        'ignoredFiles': ['/dataset_description.json', '/participants.tsv'],
-    }
+    ignored_files = ['/dataset_description.json', '/participants.tsv']
     # Limit validation only to data from requested participants
     if participant_label:
-        all_subs = {s.name[4:] for s in bids_dir.glob('sub-*')}
+        with os.scandir(bids_dir) as entries:
+            all_subs = {e.name[4:] for e in entries if e.name.startswith('sub-') and e.is_dir()}
         selected_subs = {s[4:] if s.startswith('sub-') else s for s in participant_label}
         bad_labels = selected_subs.difference(all_subs)
         if bad_labels:
@@ -570,9 +777,14 @@ def validate_input_dir(exec_env, bids_dir, participant_label, need_T1w=True):
         ignored_subs = all_subs.difference(selected_subs)
         if ignored_subs:
             for sub in ignored_subs:
-                validator_config_dict['ignoredFiles'].append(f'/sub-{sub}/**')
+                ignored_files.append(f'/sub-{sub}/**')
+
+    validator_config = _VALIDATOR_CONFIG_TEMPLATE % (
+        json.dumps(['NO_T1W'] if need_T1w else []),
+        json.dumps(ignored_files),
+    )
     with tempfile.NamedTemporaryFile(mode='w+', suffix='.json') as temp:
-        temp.write(json.dumps(validator_config_dict))
+        temp.write(validator_config)
         temp.flush()
         try:
             subprocess.check_call(['bids-validator', str(bids_dir), '-c', temp.name])  # noqa: S607
@@ -589,7 +801,7 @@ def _find_nearest_path(path_dict, input_path):
 
     Parameters
     ----------
-    path_dict : dict of (str, Path)
+    path_dict : dict of (str, Path) or tuple of (str, Path) pairs
         A dictionary of paths.
     input_path : Path
         The input path to match.
@@ -628,20 +840,27 @@ def _find_nearest_path(path_dict, input_path):
         return input_path
 
     input_path = Path(input_path)
-    matching_path = None
-    for key, path in path_dict.items():
-        if input_path.is_relative_to(path):
-            relative_path = input_path.relative_to(path)
-            if (matching_path is None) or (len(relative_path.parts) < len(matching_path.parts)):
-                matching_key = key
-                matching_path = relative_path
+    roots = tuple(path_dict.items()) if isinstance(path_dict, dict) else path_dict
+    match = _find_nearest_root(roots, input_path.parent)
+    if match is None:
+        return str(input_path.absolute())
+
+    key, path = match
+    return f'{key}{input_path.relative_to(path)}'
 
-    if matching_path is None:
-        matching_path = str(input_path.absolute())
-    else:
-        matching_path = f'{matching_key}{matching_path}'
 
-    return matching_path
+@lru_cache(maxsize=1024)
+def _find_nearest_root(roots, folder):
+    """Find the deepest ``(key, path)`` pair in ``roots`` that contains ``folder``.
+
+    Files tend to share a handful of folders, so the lookup is cached by folder.
+    Roots of equal depth are tried in their original order.
+    """
+    for key, path in sorted(roots, key=lambda root: len(Path(root[1]).parts), reverse=True):
+        if folder.is_relative_to(path):
+            return key, path
+
+    return None
 
 
 def _get_bidsuris(in_files, dataset_links, out_dir):
@@ -651,8 +870,15 @@ def _get_bidsuris(in_files, dataset_links, out_dir):
     # Remove undefined inputs
     in_files = [f for f in in_files if isdefined(f)]
     # Convert the dataset links to BIDS URI prefixes
-    updated_keys = {f'bids:{k}:': Path(v) for k, v in dataset_links.items()}
-    updated_keys['bids::'] = Path(out_dir)
+    updated_keys = _get_bidsuri_prefixes(tuple(dataset_links.items()), str(out_dir))
     # Convert the paths to BIDS URIs
     out = [_find_nearest_path(updated_keys, f) for f in in_files]
     return out
+
+
+@lru_cache(maxsize=16)
+def _get_bidsuri_prefixes(dataset_links, out_dir):
+    """Map BIDS-URI prefixes to dataset roots."""
+    prefixes = [(f'bids:{k}:', Path(v)) for k, v in dataset_links]
+    prefixes.append(('bids::', Path(out_dir)))
+    return tuple(prefixes)
@@ -20,11 +20,10 @@ def describe_atlases(atlases):
     }
 
     atlas_strings = []
-    described_atlases = []
     atlases_4s = [atlas for atlas in atlases if str(atlas).startswith('4S')]
-    described_atlases += atlases_4s
+    described_atlases = set(atlases_4s)
     if atlases_4s:
-        parcels = [int(str(atlas[2:-7])) for atlas in atlases_4s]
+        parcels = [int(atlas[2:-7]) for atlas in atlases_4s]
         s = (
             'the Schaefer Supplemented with Subcortical Structures (4S) atlas '
             '[@Schaefer_2017;@pauli2018high;@king2019functional;@najdenovska2018vivo;'
@@ -33,10 +32,11 @@ def describe_atlases(atlases):
         )
         atlas_strings.append(s)
 
+    requested_atlases = set(atlases)
     for k, v in atlas_descriptions.items():
-        if k in atlases:
+        if k in requested_atlases:
             atlas_strings.append(v)
-            described_atlases.append(k)
+            described_atlases.add(k)
 
     undescribed_atlases = [atlas for atlas in atlases if atlas not in described_atlases]
     for atlas in undescribed_atlases:
@@ -3,6 +3,7 @@
 """Utilities for working with FreeSurfer outputs."""
 
 import os
+from functools import lru_cache
 from pathlib import Path
 
 
@@ -12,30 +13,39 @@ def find_fs_path(freesurfer_dir, subject_id, session_id=None):
     if freesurfer_dir is None:
         return None
 
-    # Look for longitudinal pipeline outputs first
+    return _find_fs_path(os.fspath(freesurfer_dir), subject_id, session_id)
+
+
+@lru_cache(maxsize=2048)
+def _find_fs_path(freesurfer_dir, subject_id, session_id):
+    subject_dirs = _list_subject_dirs(freesurfer_dir)
+    if subject_dirs is None:
+        return None
+
+    candidates = []
     if session_id is not None:
-        nosub = os.path.join(freesurfer_dir, f'{subject_id}_{session_id}.long.{subject_id}')
-        if os.path.exists(nosub):
-            return Path(nosub)
-        withsub = os.path.join(
-            freesurfer_dir,
+        candidates += [
+            # Look for longitudinal pipeline outputs first
+            f'{subject_id}_{session_id}.long.{subject_id}',
             f'sub-{subject_id}_ses-{session_id}.long.sub-{subject_id}',
-        )
-        if os.path.exists(withsub):
-            return Path(withsub)
-
-        # Next try with session but not longitudinal processing, if specified
-        nosub = os.path.join(freesurfer_dir, f'{subject_id}_{session_id}')
-        if os.path.exists(nosub):
-            return Path(nosub)
-        withsub = os.path.join(freesurfer_dir, f'sub-{subject_id}_ses-{session_id}')
-        if os.path.exists(withsub):
-            return Path(withsub)
-
-    nosub = os.path.join(freesurfer_dir, subject_id)
-    if os.path.exists(nosub):
-        return Path(nosub)
-    withsub = os.path.join(freesurfer_dir, f'sub-{subject_id}')
-    if os.path.exists(withsub):
-        return Path(withsub)
+            # Next try with session but not longitudinal processing, if specified
+            f'{subject_id}_{session_id}',
+            f'sub-{subject_id}_ses-{session_id}',
+        ]
+
+    candidates += [subject_id, f'sub-{subject_id}']
+    for candidate in candidates:
+        if candidate in subject_dirs:
+            return Path(os.path.join(freesurfer_dir, candidate))
+
     return None
+
+
+@lru_cache(maxsize=16)
+def _list_subject_dirs(freesurfer_dir):
+    """List a subjects directory once, so every subject is looked up in the same listing."""
+    try:
+        with os.scandir(freesurfer_dir) as entries:
+            return frozenset(e.name for e in entries if e.is_dir())
+    except (FileNotFoundError, NotADirectoryError):
+        return None
@@ -9,8 +9,7 @@ def convert_gifti_to_annot(gifti, atlas, hemi, labels_file):
     import numpy as np
     import pandas as pd
 
-    labels_df = pd.read_table(labels_file)
-    atlas_labels = labels_df['label'].tolist()
+    atlas_labels = pd.read_table(labels_file, usecols=['label'])['label']
 
     gifti_img = nb.load(gifti)
     colors = _create_colors(len(atlas_labels))
@@ -27,15 +26,27 @@ def convert_gifti_to_annot(gifti, atlas, hemi, labels_file):
     return annot
 
 
-def _create_colors(n_colors):
-    """Create RGBT-format colors for annotation files."""
+def _create_colors(n_colors, seed=None):
+    """Create RGBT-format colors for annotation files.
+
+    The first color is black, for the unknown label.
+    Pass ``seed`` to draw the same colors on every call.
+    """
     import numpy as np
 
-    color_set = {(0, 0, 0, 0)}
-    while len(color_set) < n_colors:
-        new_color = tuple((np.random.rand(3) * 155).astype(np.int32)) + (0,)
-        color_set.add(new_color)
-    color_mat = np.array(sorted(color_set))
+    rng = np.random.default_rng(seed)
+    n_labels = max(n_colors - 1, 0)
+    colors = np.empty((0, 3), dtype=np.int32)
+    while colors.shape[0] < n_labels:
+        draws = rng.integers(0, 155, size=(4 * n_labels, 3), dtype=np.int32)
+        colors = np.unique(np.vstack((colors, draws)), axis=0)
+        # Black is reserved for the unknown label
+        colors = colors[colors.any(axis=1)]
+
+    # Subsample rather than truncate, since np.unique returns the colors sorted
+    keep = np.sort(rng.choice(colors.shape[0], n_labels, replace=False))
+    color_mat = np.zeros((n_labels + 1, 4), dtype=np.int32)
+    color_mat[1:, :3] = colors[keep]
     if color_mat.shape[0] != n_colors:
         raise ValueError(f'Could not generate {n_colors} unique colors.')
 
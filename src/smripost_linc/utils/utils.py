@@ -1,13 +1,18 @@
 """Utility functions for sMRIPost-LINC."""
 
 import logging
+import os
 import os.path as op
+from functools import lru_cache
 
 import numpy as np
 import pandas as pd
 
 LGR = logging.getLogger(__name__)
 
+# fMRIPrep confounds columns, in FSL order (rotations first)
+_FMRIPREP_MOTION_COLS = ['rot_x', 'rot_y', 'rot_z', 'trans_x', 'trans_y', 'trans_z']
+
 
 def motpars_fmriprep2fsl(confounds):
     """Convert fMRIPrep motion parameters to FSL format.
@@ -26,15 +31,30 @@ def motpars_fmriprep2fsl(confounds):
         translations second.
     """
     if isinstance(confounds, str) and op.isfile(confounds):
-        confounds = pd.read_table(confounds)
+        # Copy, so callers cannot modify the cached array
+        return _load_confounds_tsv(confounds, os.stat(confounds).st_mtime_ns).copy()
     elif not isinstance(confounds, pd.DataFrame):
         raise ValueError('Input must be an existing file or a DataFrame.')
 
     # Rotations are in radians
-    motpars_fsl = confounds[['rot_x', 'rot_y', 'rot_z', 'trans_x', 'trans_y', 'trans_z']].values
+    motpars_fsl = confounds[_FMRIPREP_MOTION_COLS].values
     return motpars_fsl
 
 
+@lru_cache(maxsize=32)
+def _load_confounds_tsv(confounds_file, mtime_ns):
+    """Read the motion parameters from an fMRIPrep confounds file, in FSL order.
+
+    The file's modification time is part of the cache key, so edited files are re-read.
+    """
+    # Only parse the six motion columns, out of the many in a confounds file.
+    # usecols keeps them in file order, so reorder the array with a single fancy index
+    # instead of a pandas column gather.
+    confounds = pd.read_table(confounds_file, usecols=_FMRIPREP_MOTION_COLS, dtype=np.float64)
+    order = [confounds.columns.get_loc(col) for col in _FMRIPREP_MOTION_COLS]
+    return confounds.to_numpy(dtype=np.float64, copy=False)[:, order]
+
+
 def motpars_spm2fsl(motpars):
     """Convert SPM format motion parameters to FSL format.
 
@@ -58,14 +78,11 @@ def motpars_spm2fsl(motpars):
     if motpars.shape[1] != 6:
         raise ValueError(f'Motion parameters must have exactly 6 columns, not {motpars.shape[1]}.')
 
-    # Split translations from rotations
-    trans, rot = motpars[:, :3], motpars[:, 3:]
-
-    # Convert rotations from degrees to radians
-    rot *= np.pi / 180.0
-
-    # Place rotations first
-    motpars_fsl = np.hstack((rot, trans))
+    # Place rotations first, converting them from degrees to radians.
+    # Write into a new array so the input isn't modified in place.
+    motpars_fsl = np.empty(motpars.shape, dtype=np.float64)
+    np.deg2rad(motpars[:, 3:], out=motpars_fsl[:, :3])
+    motpars_fsl[:, 3:] = motpars[:, :3]
     return motpars_fsl
 
 
@@ -92,15 +109,22 @@ def motpars_afni2fsl(motpars):
     if motpars.shape[1] != 6:
         raise ValueError(f'Motion parameters must have exactly 6 columns, not {motpars.shape[1]}.')
 
-    # Split translations from rotations
-    trans, rot = motpars[:, :3], motpars[:, 3:]
+    # Place rotations first, converting them from degrees to radians.
+    # Write into a new array so the input isn't modified in place.
+    motpars_fsl = np.empty(motpars.shape, dtype=np.float64)
+    np.deg2rad(motpars[:, 3:], out=motpars_fsl[:, :3])
+    motpars_fsl[:, 3:] = motpars[:, :3]
+    return motpars_fsl
 
-    # Convert rotations from degrees to radians
-    rot *= np.pi / 180.0
 
-    # Place rotations first
-    motpars_fsl = np.hstack((rot, trans))
-    return motpars_fsl
+# Motion parameter sources by file extension, for files not named like SPM's rp_*.txt
+_MOTPARS_SOURCES = {'.1D': 'afni', '.tsv': 'fmriprep', '.txt': 'fsl'}
+_MOTPARS_LOADERS = {
+    'spm': motpars_spm2fsl,
+    'afni': motpars_afni2fsl,
+    'fsl': np.loadtxt,
+    'fmriprep': motpars_fmriprep2fsl,
+}
 
 
 def load_motpars(motion_file, source='auto'):
@@ -121,29 +145,18 @@ def load_motpars(motion_file, source='auto'):
         translations second.
     """
     if source == 'auto':
-        if op.basename(motion_file).startswith('rp_') and motion_file.endswith('.txt'):
+        ext = op.splitext(motion_file)[1]
+        if ext == '.txt' and op.basename(motion_file).startswith('rp_'):
             source = 'spm'
-        elif motion_file.endswith('.1D'):
-            source = 'afni'
-        elif motion_file.endswith('.tsv'):
-            source = 'fmriprep'
-        elif motion_file.endswith('.txt'):
-            source = 'fsl'
+        elif ext in _MOTPARS_SOURCES:
+            source = _MOTPARS_SOURCES[ext]
         else:
             raise Exception('Motion parameter source could not be determined automatically.')
 
-    if source == 'spm':
-        motpars = motpars_spm2fsl(motion_file)
-    elif source == 'afni':
-        motpars = motpars_afni2fsl(motion_file)
-    elif source == 'fsl':
-        motpars = np.loadtxt(motion_file)
-    elif source == 'fmriprep':
-        motpars = motpars_fmriprep2fsl(motion_file)
-    else:
+    if source not in _MOTPARS_LOADERS:
         raise ValueError(f'Source "{source}" not supported.')
 
-    return motpars
+    return _MOTPARS_LOADERS[source](motion_file)
 
 
 def get_resource_path():
@@ -173,9 +186,8 @@ def _get_wf_name(bold_fname, prefix):
     'preproc_task_nback_run_01_echo_1_wf'
 
     """
-    from nipype.utils.filemanip import split_filename
-
-    fname = split_filename(bold_fname)[1]
+    # BIDS filenames only contain dots in their extension
+    fname = op.basename(bold_fname).split('.', 1)[0]
     fname_nosub = '_'.join(fname.split('_')[1:-1])
     return f"{prefix}_{fname_nosub.replace('-', '_')}_wf"
 
@@ -197,10 +209,14 @@ def update_dict(orig_dict, new_dict):
     """
     updated_dict = orig_dict.copy()
     for key, value in new_dict.items():
-        if (orig_dict.get(key) is not None) and (value is not None):
-            print(f'Updating {key} from {orig_dict[key]} to {value}')
-            updated_dict[key].update(value)
-        elif value is not None:
+        if value is None:
+            continue
+
+        orig_value = orig_dict.get(key)
+        if orig_value is not None:
+            LGR.debug('Updating %s from %s to %s', key, orig_value, value)
+            orig_value.update(value)
+        else:
             updated_dict[key] = value
 
     return updated_dict
@@ -243,6 +259,7 @@ def list_to_str(lst):
         return f"{', '.join(lst_str[:-1])}, and {lst_str[-1]}"
 
 
+@lru_cache(maxsize=4096)
 def split_filename(fname):
     """Split a filename into parts: path, base filename and extension.
 
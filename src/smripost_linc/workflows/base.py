@@ -30,6 +30,8 @@ sMRIPost-LINC workflows
 
 """
 
+from __future__ import annotations
+
 import os
 import sys
 from collections import defaultdict
@@ -42,6 +44,11 @@ from packaging.version import Version
 from smripost_linc import config
 from smripost_linc.utils.utils import _get_wf_name, update_dict
 
+try:  # Use the libyaml emitter when PyYAML was built with it
+    from yaml import CSafeDumper as _YAMLDumper
+except ImportError:
+    from yaml import SafeDumper as _YAMLDumper
+
 
 def init_smripost_linc_wf():
     """Build *sMRIPost-LINC*'s pipeline.
@@ -85,8 +92,11 @@ def init_smripost_linc_wf():
         single_subject_wf.config['execution']['crashdump_dir'] = str(
             config.execution.output_dir / f'sub-{subject_id}' / 'log' / config.execution.run_uuid
         )
+        # Nodes only read their config (nipype merges it into fresh copies at run time),
+        # so a single copy can be shared by the whole subject workflow
+        node_config = deepcopy(single_subject_wf.config)
         for node in single_subject_wf._get_all_nodes():
-            node.config = deepcopy(single_subject_wf.config)
+            node.config = node_config
 
         smripost_linc_wf.connect([
             (load_atlases_wf, single_subject_wf, [
@@ -202,9 +212,7 @@ It is released under the [CC0]\
             f'Please check your BIDS filters: {config.execution.bids_filters}.'
         )
 
-    config.loggers.workflow.info(
-        f'Collected subject data:\n{yaml.dump(subject_data, default_flow_style=False, indent=4)}',
-    )
+    config.loggers.workflow.info('Collected subject data:\n%s', _LazyYAML(subject_data))
 
     inputnode = pe.Node(
         niu.IdentityInterface(
@@ -269,6 +277,10 @@ It is released under the [CC0]\
     )
     workflow.connect([(about, ds_report_about, [('out_report', 'in_file')])])
 
+    # The single-run workflows clean their own datasinks, so only the subject-level ones
+    # need to be handled here, before the run workflows are added.
+    clean_datasinks(workflow)
+
     for anat_file in subject_data['anat']:
         single_run_wf = init_single_run_wf(anat_file=anat_file, atlases=atlases)
         workflow.connect([
@@ -279,7 +291,7 @@ It is released under the [CC0]\
             ]),
         ])  # fmt:skip
 
-    return clean_datasinks(workflow)
+    return workflow
 
 
 def init_single_run_wf(anat_file, atlases):
@@ -360,10 +372,9 @@ def init_single_run_wf(anat_file, atlases):
         )
 
     config.loggers.workflow.info(
-        (
-            f'Collected preprocessing derivatives for {os.path.basename(anat_file)}:\n'
-            f'{yaml.dump(anatomical_cache, default_flow_style=False, indent=4)}'
-        ),
+        'Collected preprocessing derivatives for %s:\n%s',
+        os.path.basename(anat_file),
+        _LazyYAML(anatomical_cache),
     )
 
     inputnode = pe.Node(
@@ -408,20 +419,34 @@ def init_single_run_wf(anat_file, atlases):
     # Calculate myelin map if both T1w and T2w are available
 
     # Fill-in datasinks seen so far
-    for node in workflow.list_node_names():
-        node_name = node.split('.')[-1]
-        if node_name.startswith('ds_'):
-            workflow.get_node(node).inputs.base_directory = config.execution.output_dir
+    return clean_datasinks(workflow, source_file=anat_file)
 
-            if not node_name.startswith('ds_atlas_'):
-                workflow.get_node(node).inputs.source_file = anat_file
 
-    return workflow
+class _LazyYAML:
+    """Defer dumping data to YAML until a log record is actually formatted."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        # The safe dumpers only represent plain dicts, not defaultdicts
+        return yaml.dump(dict(self.data), Dumper=_YAMLDumper, default_flow_style=False, indent=4)
+
+
+def clean_datasinks(workflow: pe.Workflow, source_file: str | None = None) -> pe.Workflow:
+    """Overwrite ``out_path_base`` of smriprep's DataSinks.
+
+    If ``source_file`` is provided, the DataSinks' output directory and source file
+    (except for atlas DataSinks) are filled in during the same pass over the workflow.
+    """
+    for node in workflow._get_all_nodes():
+        if not node.name.startswith('ds_'):
+            continue
 
+        node.interface.out_path_base = ''
+        if source_file is not None:
+            node.inputs.base_directory = config.execution.output_dir
+            if not node.name.startswith('ds_atlas_'):
+                node.inputs.source_file = source_file
 
-def clean_datasinks(workflow: pe.Workflow) -> pe.Workflow:
-    """Overwrite ``out_path_base`` of smriprep's DataSinks."""
-    for node in workflow.list_node_names():
-        if node.split('.')[-1].startswith('ds_'):
-            workflow.get_node(node).interface.out_path_base = ''
     return workflow
@@ -2,7 +2,6 @@
 # vi: set ft=python sts=4 ts=4 sw=4 et:
 """Workflows for working with FreeSurfer derivatives."""
 
-from nipype.interfaces import freesurfer as fs
 from nipype.interfaces import utility as niu
 from nipype.pipeline import engine as pe
 from niworkflows.engine.workflows import LiterateWorkflow as Workflow
@@ -32,6 +31,11 @@ def init_parcellate_external_wf(
 
     Parameters
     ----------
+    name_source : :obj:`str`
+        Path to the file that names the output files.
+    atlases : :obj:`dict` or :obj:`list` of :obj:`str`
+        The atlases to parcellate, as returned by
+        :func:`~smripost_linc.utils.bids.collect_atlases`, or just their names.
     mem_gb : :obj:`dict`
         Dictionary of memory allocations.
     name : :obj:`str`
@@ -41,20 +45,24 @@ def init_parcellate_external_wf(
     Inputs
     ------
     lh_fsnative_annots
+        Left-hemisphere fsnative annot files, in the same order as ``atlases``.
     rh_fsnative_annots
+        Right-hemisphere fsnative annot files, in the same order as ``atlases``.
 
     Outputs
     -------
     parcellated_tsvs
         Parcellated TSV files. One for each atlas and hemisphere.
     """
+    from nipype.interfaces import freesurfer as fs
+
     from smripost_linc.interfaces.freesurfer import CopyAnnots, FreesurferFiles
     from smripost_linc.interfaces.misc import ParcellationStats2TSV
 
-    print(mem_gb)
-
     workflow = Workflow(name=name)
 
+    atlas_names = list(atlases)
+
     inputnode = pe.Node(
         niu.IdentityInterface(
             fields=[
@@ -101,104 +109,151 @@ def init_parcellate_external_wf(
             ]),
         ])  # fmt:skip
 
-        # Parcellate each data file with each atlas in each hemisphere
-        for atlas in atlases:
-            prepare_segstats_arg = pe.Node(
-                niu.Merge(3),
-                name=f'prepare_segstats_arg_{hemi}_{atlas}',
-            )
-            prepare_segstats_arg.inputs.in2 = hemi
-            prepare_segstats_arg.inputs.in3 = atlas
-            workflow.connect([
-                (copy_freesurfer_files, prepare_segstats_arg, [('subject_id', 'in1')]),
-            ])  # fmt:skip
-
-            mri_segstats = pe.MapNode(
-                fs.SegStats(),
-                name=f'mri_segstats_{hemi}_{atlas}',
-                iterfield=['in_file', 'slabel', 'args'],
-            )
-            workflow.connect([
-                (fs_files, mri_segstats, [
-                    ('files', 'in_file'),
-                    ('names', 'slabel'),
-                    ('arguments', 'args'),
-                ]),
-                (copy_freesurfer_files, mri_segstats, [('output_dir', 'subjects_dir')]),
-                (prepare_segstats_arg, mri_segstats, [('out', 'annot')]),
-            ])  # fmt:skip
-
-            # Convert parcellated data to TSV
-            segstats_to_tsv = pe.MapNode(
-                ParcellationStats2TSV(
-                    hemi=hemi,
-                    atlas=atlas,
-                ),
-                name=f'segstats_to_tsv_{hemi}_{atlas}',
-                iterfield=['in_file'],
-            )
-            workflow.connect([(mri_segstats, segstats_to_tsv, [('out_file', 'in_file')])])
-
-            # Write out parcellated data
-            ds_segstats_tsv = pe.MapNode(
-                DerivativesDataSink(
-                    source_file=name_source,
-                    space='fsnative',
-                    segmentation=atlas,
-                    hemi=hemi,
-                    suffix='morph',
-                    extension='.tsv',
-                ),
-                name=f'ds_segstats_tsv_{hemi}_{atlas}',
-                iterfield=['in_file', 'statistic'],
-            )
-            workflow.connect([
-                (fs_files, ds_segstats_tsv, [('names', 'statistic')]),
-                (segstats_to_tsv, ds_segstats_tsv, [('out_file', 'in_file')]),
-            ])  # fmt:skip
-
-            # Now calculate standard surface stats
-            parcellation_stats = pe.Node(
-                fs.ParcellationStats(subject_id='', hemisphere=hemi, th3=True, noglobal=True),
-                name=f'parcellation_stats_{hemi}_{atlas}',
-            )
-            workflow.connect([
-                (inputnode, parcellation_stats, [(f'{hemi}_fsnative_annots', 'in_annotation')]),
-            ])  # fmt:skip
-
-            # Convert parcellated data to TSV
-            parcstats_to_tsv = pe.Node(
-                ParcellationStats2TSV(hemi=hemi, atlas=atlas),
-                name=f'parcstats_to_tsv_{hemi}_{atlas}',
-            )
-            workflow.connect([(parcellation_stats, parcstats_to_tsv, [('out_file', 'in_file')])])
-
-            # Write out parcellated data
-            ds_parcstats_tsv = pe.Node(
-                DerivativesDataSink(
-                    source_file=name_source,
-                    space='fsnative',
-                    segmentation=atlas,
-                    hemi=hemi,
-                    statistic='freesurfer',
-                    suffix='morph',
-                    extension='.tsv',
-                ),
-                name=f'ds_parcstats_tsv_{hemi}_{atlas}',
-            )
-            workflow.connect([
-                (fs_files, ds_parcstats_tsv, [('names', 'in_file')]),
-                (parcstats_to_tsv, ds_parcstats_tsv, [('out_file', 'in_file')]),
-            ])  # fmt:skip
+        # Parcellate each data file with each atlas.
+        # Pair every file with every atlas up front, so that one MapNode per step
+        # covers all atlases, instead of separate nodes for each atlas.
+        prepare_segstats_args = pe.Node(
+            niu.Function(
+                input_names=['subject_id', 'hemi', 'atlases', 'files', 'names', 'arguments'],
+                output_names=['in_file', 'slabel', 'args', 'annot', 'atlas'],
+                function=pair_segstats_inputs,
+            ),
+            name=f'prepare_segstats_args_{hemi}',
+        )
+        prepare_segstats_args.inputs.hemi = hemi
+        prepare_segstats_args.inputs.atlases = atlas_names
+        workflow.connect([
+            (copy_freesurfer_files, prepare_segstats_args, [('subject_id', 'subject_id')]),
+            (fs_files, prepare_segstats_args, [
+                ('files', 'files'),
+                ('names', 'names'),
+                ('arguments', 'arguments'),
+            ]),
+        ])  # fmt:skip
+
+        mri_segstats = pe.MapNode(
+            fs.SegStats(),
+            name=f'mri_segstats_{hemi}',
+            iterfield=['in_file', 'slabel', 'args', 'annot'],
+        )
+        workflow.connect([
+            (prepare_segstats_args, mri_segstats, [
+                ('in_file', 'in_file'),
+                ('slabel', 'slabel'),
+                ('args', 'args'),
+                ('annot', 'annot'),
+            ]),
+            (copy_freesurfer_files, mri_segstats, [('output_dir', 'subjects_dir')]),
+        ])  # fmt:skip
+
+        # Convert parcellated data to TSV
+        segstats_to_tsv = pe.MapNode(
+            ParcellationStats2TSV(hemisphere=hemi),
+            name=f'segstats_to_tsv_{hemi}',
+            iterfield=['in_file', 'atlas'],
+        )
+        workflow.connect([
+            (prepare_segstats_args, segstats_to_tsv, [('atlas', 'atlas')]),
+            (mri_segstats, segstats_to_tsv, [('summary_file', 'in_file')]),
+        ])  # fmt:skip
+
+        # Write out parcellated data
+        ds_segstats_tsv = pe.MapNode(
+            DerivativesDataSink(
+                source_file=name_source,
+                space='fsnative',
+                hemi=hemi,
+                suffix='morph',
+                extension='.tsv',
+            ),
+            name=f'ds_segstats_tsv_{hemi}',
+            iterfield=['in_file', 'statistic', 'segmentation'],
+        )
+        workflow.connect([
+            (prepare_segstats_args, ds_segstats_tsv, [
+                ('slabel', 'statistic'),
+                ('atlas', 'segmentation'),
+            ]),
+            (segstats_to_tsv, ds_segstats_tsv, [('out_file', 'in_file')]),
+        ])  # fmt:skip
+
+        # Now calculate standard surface stats for each atlas
+        parcellation_stats = pe.MapNode(
+            fs.ParcellationStats(subject_id='', hemisphere=hemi, th3=True, noglobal=True),
+            name=f'parcellation_stats_{hemi}',
+            iterfield=['in_annotation'],
+        )
+        workflow.connect([
+            (inputnode, parcellation_stats, [(f'{hemi}_fsnative_annots', 'in_annotation')]),
+        ])  # fmt:skip
+
+        # Convert parcellated data to TSV
+        parcstats_to_tsv = pe.MapNode(
+            ParcellationStats2TSV(hemisphere=hemi),
+            name=f'parcstats_to_tsv_{hemi}',
+            iterfield=['in_file', 'atlas'],
+        )
+        parcstats_to_tsv.inputs.atlas = atlas_names
+        workflow.connect([(parcellation_stats, parcstats_to_tsv, [('out_table', 'in_file')])])
+
+        # Write out parcellated data
+        ds_parcstats_tsv = pe.MapNode(
+            DerivativesDataSink(
+                source_file=name_source,
+                space='fsnative',
+                hemi=hemi,
+                statistic='freesurfer',
+                suffix='morph',
+                extension='.tsv',
+            ),
+            name=f'ds_parcstats_tsv_{hemi}',
+            iterfield=['in_file', 'segmentation'],
+        )
+        ds_parcstats_tsv.inputs.segmentation = atlas_names
+        workflow.connect([(parcstats_to_tsv, ds_parcstats_tsv, [('out_file', 'in_file')])])
 
     return workflow
 
 
+def pair_segstats_inputs(subject_id, hemi, atlases, files, names, arguments):
+    """Pair each FreeSurfer file to parcellate with each atlas, for mri_segstats.
+
+    The pairs are grouped by atlas, in the order of ``atlases``.
+    Each pair names its annotation by ``(subject_id, hemi, atlas)``, so the pairing
+    does not depend on the order of the fsnative annot files.
+    The ``parcellation_stats`` MapNode does iterate over those files, though,
+    so ``{hemi}_fsnative_annots`` must follow the order of ``atlases``,
+    as :func:`~smripost_linc.workflows.parcellation.init_warp_atlases_to_fsnative_wf`
+    produces them.
+
+    Returns
+    -------
+    in_file, slabel, args : list
+        The FreeSurfer files, their names, and their mri_segstats arguments,
+        repeated for each atlas.
+    annot : list of tuple
+        The ``(subject_id, hemi, atlas)`` annotation for each pair.
+    atlas : list of str
+        The atlas for each pair.
+    """
+    in_file, slabel, args, annot, atlas_names = [], [], [], [], []
+    for atlas in atlases:
+        in_file += files
+        slabel += names
+        args += arguments
+        annot += [(subject_id, hemi, atlas)] * len(files)
+        atlas_names += [atlas] * len(files)
+
+    return in_file, slabel, args, annot, atlas_names
+
+
 def symlink_freesurfer_dir(freesurfer_dir, output_dir=None):
     """Symlink the FreeSurfer directory to the output directory.
 
-    Folders will be created in the output directory if they do not exist,
-    while files will be symlinked.
+    Folders that downstream tools write into (``label``, ``mri``, and ``stats``)
+    are created in the output directory, with their files hardlinked
+    (or symlinked, if the two directories are on different filesystems).
+    All other folders and files are symlinked as a whole.
 
     Parameters
     ----------
@@ -225,21 +280,53 @@ def symlink_freesurfer_dir(freesurfer_dir, output_dir=None):
     if not output_dir.exists():
         output_dir.mkdir(parents=True)
 
-    for root, _, files in os.walk(freesurfer_dir):
-        output_sub_dir = output_dir / Path(root).relative_to(freesurfer_dir)
-        output_sub_dir.mkdir(exist_ok=True)
-
-        for file_ in files:
-            os.symlink(
-                Path(root) / file_,
-                output_sub_dir / file_,
-            )
+    # Only these folders receive new files (e.g., annot files copied into label/),
+    # so they need to be real directories rather than links back to the input.
+    writable_dirs = ('label', 'mri', 'stats')
+
+    # Hardlinks spare downstream tools a symlink resolution on every open,
+    # but they only work within a single filesystem
+    use_hardlinks = os.stat(freesurfer_dir).st_dev == os.stat(output_dir).st_dev
+
+    def _link(src, dst, hardlink=False):
+        if os.path.lexists(dst):
+            return
+
+        if hardlink:
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                # e.g., hardlinks are not permitted for files owned by another user
+                pass
+
+        os.symlink(src, dst)
+
+    def _mirror(src_dir, dst_dir):
+        dst_dir.mkdir(exist_ok=True)
+        with os.scandir(src_dir) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    _mirror(entry.path, dst_dir / entry.name)
+                else:
+                    _link(entry.path, dst_dir / entry.name, hardlink=use_hardlinks)
+
+    with os.scandir(freesurfer_dir) as entries:
+        top_level = [(entry.path, entry.name, entry.is_dir()) for entry in entries]
+
+    for path, name, is_dir in top_level:
+        if is_dir and name in writable_dirs:
+            _mirror(path, output_dir / name)
+        else:
+            _link(path, output_dir / name)
 
     return str(output_dir)
 
 
 def init_convert_metrics_to_cifti_wf(name='convert_metrics_to_cifti_wf'):
     """Convert FreeSurfer metrics from MGH format to CIFTI format in fsLR space."""
+    from nipype.interfaces import freesurfer as fs
+
     from smripost_linc.interfaces.freesurfer import CollectFSAverageSurfaces
     from smripost_linc.interfaces.misc import CiftiCreateDenseScalar
 
@@ -280,7 +367,6 @@ def init_convert_metrics_to_cifti_wf(name='convert_metrics_to_cifti_wf'):
             (collect_fsaverage_surfaces, convert_to_gifti, [
                 (f'{hemi}_fsaverage_files', 'in_file'),
             ]),
-            (convert_to_gifti, convert_gifti_to_cifti, [('out_file', f'{hemi}_gifti')]),
         ])  # fmt:skip
 
         warp_fsaverage_to_fslr = pe.MapNode(
@@ -289,12 +375,12 @@ def init_convert_metrics_to_cifti_wf(name='convert_metrics_to_cifti_wf'):
                 output_names=['out_file'],
                 function=fsaverage_to_fslr,
             ),
-            name='warp_fsaverage_to_fslr',
+            name=f'warp_fsaverage_to_fslr_{hemi}',
             iterfield=['in_file'],
         )
         warp_fsaverage_to_fslr.inputs.hemi = hemi
         workflow.connect([
-            (convert_to_gifti, warp_fsaverage_to_fslr, [('out_file', 'in_file')]),
+            (convert_to_gifti, warp_fsaverage_to_fslr, [('converted', 'in_file')]),
             (warp_fsaverage_to_fslr, convert_gifti_to_cifti, [('out_file', f'{hemi}_gifti')]),
         ])  # fmt:skip
 
@@ -315,20 +401,19 @@ def init_convert_metrics_to_cifti_wf(name='convert_metrics_to_cifti_wf'):
 
 
 def fsaverage_to_fslr(in_file, hemi):
-    """Convert fsaverage-space GIFTI files to a CIFTI file in fsLR space."""
+    """Convert an fsaverage-space GIFTI file to fsLR space."""
     import os
 
     from neuromaps import transforms
 
-    out_file = os.path.abspath('cifti.dscalar.nii')
-
+    # neuromaps returns a tuple of images, with one image per requested hemisphere
     fslr_gifti = transforms.fsaverage_to_fslr(
         in_file,
         target_density='164k',
         hemi=hemi[0].upper(),
         method='linear',
-    )
-    out_file = os.path.abspath(f'{hemi}.dscalar.nii')
+    )[0]
+    out_file = os.path.abspath(f'{hemi}.func.gii')
     fslr_gifti.to_filename(out_file)
 
     return out_file
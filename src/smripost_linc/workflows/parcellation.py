@@ -132,20 +132,16 @@ The following atlases were used in the workflow: {atlas_str}.
                     in_file=info['image'],
                     metric='CORTEX_LEFT',
                     direction='COLUMN',
-                    num_threads=config.nipype.omp_nthreads,
                 ),
                 name=f'lh_cifti_to_gifti_{atlas}',
-                n_procs=config.nipype.omp_nthreads,
             )
             rh_cifti_to_gifti = pe.Node(
                 CiftiSeparateMetric(
                     in_file=info['image'],
                     metric='CORTEX_RIGHT',
                     direction='COLUMN',
-                    num_threads=config.nipype.omp_nthreads,
                 ),
                 name=f'rh_cifti_to_gifti_{atlas}',
-                n_procs=config.nipype.omp_nthreads,
             )
             workflow.connect([
                 (lh_cifti_to_gifti, gifti_buffer, [('out_file', 'lh_gifti')]),